@@ -0,0 +1,66 @@
+import os
+import numpy as np
+import soundfile as sf
+
+SAMPLE_RATE = 22050
+
+def _quiet(rng, duration):
+    """Tono suave y casi sin energía"""
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    return 0.02 * np.sin(2 * np.pi * 220 * t) + 0.002 * rng.standard_normal(len(t))
+
+def _dense(rng, duration):
+    """Muchos parciales con modulación y ruido: espectro lleno y mucha energía"""
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    freqs = rng.uniform(80, 8000, 40)
+    y = sum(np.sin(2 * np.pi * f * t + rng.uniform(0, 2 * np.pi)) for f in freqs) / len(freqs)
+    y *= 0.6 + 0.4 * np.sin(2 * np.pi * 0.5 * t)
+    return 0.8 * y + 0.1 * rng.standard_normal(len(t))
+
+def _beats(rng, duration, bpm=128):
+    """Bombo y charles a tempo fijo sobre un bajo"""
+    n = int(duration * SAMPLE_RATE)
+    t = np.arange(n) / SAMPLE_RATE
+    y = 0.1 * np.sin(2 * np.pi * 55 * t)
+    kick_len = int(0.15 * SAMPLE_RATE)
+    kt = np.arange(kick_len) / SAMPLE_RATE
+    kick = np.sin(2 * np.pi * (50 + 100 * np.exp(-kt * 30)) * kt) * np.exp(-kt * 20)
+    hat_len = int(0.03 * SAMPLE_RATE)
+    hat = rng.standard_normal(hat_len) * np.exp(-np.arange(hat_len) / (hat_len / 5))
+    period = 60.0 / bpm
+    for start in np.arange(0, duration, period / 2):
+        i = int(start * SAMPLE_RATE)
+        # Bombo en cada pulso y charles en los contratiempos
+        sound = kick if round(start / period * 2) % 2 == 0 else 0.3 * hat
+        end = min(n, i + len(sound))
+        y[i:end] += sound[:end - i]
+    return 0.7 * y
+
+def _long(rng, duration):
+    """Pieza larga que alterna secciones tranquilas y densas"""
+    section = duration / 4
+    parts = [_quiet(rng, section), _dense(rng, section), _beats(rng, section), _dense(rng, section)]
+    return np.concatenate(parts)
+
+# Nombre -> (generador, duración por defecto en segundos)
+FIXTURES = {
+    'quiet': (_quiet, 10.0),
+    'dense': (_dense, 10.0),
+    'beats': (_beats, 10.0),
+    'long': (_long, 120.0),
+}
+
+def make_fixture(name: str, directory: str, duration: float = None, seed: int = 0) -> str:
+    """Escribe el audio sintético `name` como WAV en `directory` y devuelve su ruta.
+
+    El contenido depende solo del nombre, la duración y la semilla, así que
+    dos ejecuciones producen exactamente el mismo archivo.
+    """
+    generator, default_duration = FIXTURES[name]
+    duration = default_duration if duration is None else duration
+    path = os.path.join(directory, f"{name}_{duration:g}s_{seed}.wav")
+    if not os.path.exists(path):
+        y = generator(np.random.default_rng(seed), duration)
+        os.makedirs(directory, exist_ok=True)
+        sf.write(path, np.clip(y, -1, 1).astype(np.float32), SAMPLE_RATE, subtype='PCM_16')
+    return path
@@ -0,0 +1,252 @@
+"""Benchmark reproducible del pipeline audio -> vídeo.
+
+Genera audios sintéticos, mide por separado cada etapa del renderizado y
+guarda los resultados en JSON; con --baseline los compara con una ejecución
+anterior y termina con código 1 si alguna etapa empeora más del umbral.
+Todo se ejecuta en CPU y sin conexión.
+
+    python -m benchmarks.run --resolutions 640x360,1280x720 --output resultados.json
+    python -m benchmarks.run --baseline baseline.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from src.audio.cache import default_cache_dir
+from src.audio.processor import AudioProcessor
+from src.video.compositor import FrameCompositor
+from src.video.control import ControlTrack
+from src.video.encoder import create_encoder
+from src.video.particles import ParticleSystem
+from src.video.raster import RASTERIZERS
+from .fixtures import FIXTURES, make_fixture
+
+# Etapas por frame, en el orden en que se ejecutan
+FRAME_STAGES = ('emit', 'update', 'trails', 'prepare', 'glow', 'draw', 'composite', 'encode')
+
+def run_case(audio_path: str, width: int, height: int, fps: int, max_frames: int,
+             encoder: str, seed: int, rasterizer: str = 'opencv') -> dict:
+    """Renderiza un audio midiendo cada etapa (se ejecuta en un proceso propio)"""
+    start = time.perf_counter()
+    features = AudioProcessor(audio_path).process_audio()
+    # La pista de control con beats fuerza el cálculo de todo lo que usa el render
+    track = ControlTrack.from_features(features, fps, beats=True)
+    process_audio = time.perf_counter() - start
+
+    frames = min(len(track), max_frames) if max_frames else len(track)
+    timings = {stage: np.zeros(frames) for stage in FRAME_STAGES}
+    particles = np.zeros(frames, dtype=np.int64)
+    trail_points = np.zeros(frames, dtype=np.int64)
+
+    system = ParticleSystem(width, height, seed=seed, rasterizer=rasterizer)
+    compositor = FrameCompositor(width, height)
+    with tempfile.TemporaryDirectory() as tmp:
+        out = create_encoder(encoder, os.path.join(tmp, 'bench.mp4'), width, height, fps)
+        with out:
+            for i in range(frames):
+                control = track[i]
+                t0 = time.perf_counter()
+                system.create_particles(
+                    int(control['particle_count']),
+                    intensity=float(control['intensity']),
+                    frequency=float(control['frequency']),
+                    energy=float(control['energy']),
+                    note_duration=float(control['note_duration'])
+                )
+                t1 = time.perf_counter()
+                system.update(1.0 / fps)
+                t2 = time.perf_counter()
+
+                frame = compositor.canvas()
+                system.draw_trails(frame, dirty=compositor.dirty)
+                t3 = time.perf_counter()
+                # Preparar el lote (posiciones, sprites y tiles tocados) va aparte del brillo
+                batch = system.prepare_draw()
+                system.mark_dirty(batch, compositor.dirty)
+                t4 = time.perf_counter()
+                system.draw_glow(frame, batch)
+                t5 = time.perf_counter()
+                system.draw_shapes(frame, batch)
+                t6 = time.perf_counter()
+
+                frame = compositor.compose(frame, float(control['blend_factor']))
+                t7 = time.perf_counter()
+                out.write(frame)
+                t8 = time.perf_counter()
+
+                marks = (t0, t1, t2, t3, t4, t5, t6, t7, t8)
+                for stage, begin, end in zip(FRAME_STAGES, marks, marks[1:]):
+                    timings[stage][i] = end - begin
+                particles[i] = system.particles.count
+                trail_points[i] = system.trails.count
+
+            # Vaciar el codificador cuenta como tiempo de codificación
+            t0 = time.perf_counter()
+        flush = time.perf_counter() - t0
+    timings['encode'][-1:] += flush
+
+    render_time = sum(float(t.sum()) for t in timings.values())
+    return {
+        'frames': frames,
+        'fps': frames / render_time if render_time > 0 else 0.0,
+        # ru_maxrss está en KB en Linux y en bytes en macOS
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                       / (1024 * 1024 if sys.platform == 'darwin' else 1024),
+        'particles': {'mean': float(particles.mean()), 'max': int(particles.max(initial=0))},
+        'trail_points': {'mean': float(trail_points.mean()), 'max': int(trail_points.max(initial=0))},
+        'stages': {
+            'process_audio': {'total_s': process_audio},
+            **{stage: {'total_s': float(t.sum()), 'ms_per_frame': float(t.mean() * 1000),
+                       'p95_ms': float(np.percentile(t, 95) * 1000)}
+               for stage, t in timings.items()},
+        },
+    }
+
+
+def environment() -> dict:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, rss_threshold: float,
+            min_ms: float = 0.05) -> list:
+    """Lista de regresiones de `results` frente a `baseline`"""
+    regressions = []
+    for name, case in results['cases'].items():
+        base = baseline['cases'].get(name)
+        if base is None:
+            continue
+        if case['fps'] < base['fps'] * (1 - threshold):
+            regressions.append(f"{name}: fps {base['fps']:.1f} -> {case['fps']:.1f}")
+        for stage in FRAME_STAGES:
+            if stage not in base['stages']:
+                continue  # Baseline anterior a esa etapa
+            new, old = case['stages'][stage]['ms_per_frame'], base['stages'][stage]['ms_per_frame']
+            # Ignorar diferencias absolutas minúsculas (ruido de medida)
+            if new > old * (1 + threshold) and new - old > min_ms:
+                regressions.append(f"{name}: {stage} {old:.2f} -> {new:.2f} ms/frame")
+        new, old = case['stages']['process_audio']['total_s'], base['stages']['process_audio']['total_s']
+        if new > old * (1 + threshold) and new - old > min_ms / 1000 * case['frames']:
+            regressions.append(f"{name}: process_audio {old:.2f} -> {new:.2f} s")
+        if case['peak_rss_mb'] > base['peak_rss_mb'] * (1 + rss_threshold):
+            regressions.append(f"{name}: RSS {base['peak_rss_mb']:.0f} -> {case['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def print_case(name: str, case: dict, base: dict = None):
+    print(f"\n{name}: {case['frames']} frames, {case['fps']:.1f} fps, "
+          f"RSS {case['peak_rss_mb']:.0f} MB, partículas {case['particles']['mean']:.0f} "
+          f"(máx {case['particles']['max']}), estelas {case['trail_points']['mean']:.0f} "
+          f"(máx {case['trail_points']['max']})")
+    print(f"  {'process_audio':<14}{case['stages']['process_audio']['total_s']:>9.2f} s")
+    for stage in FRAME_STAGES:
+        ms = case['stages'][stage]['ms_per_frame']
+        line = f"  {stage:<14}{ms:>9.2f} ms/frame  p95 {case['stages'][stage]['p95_ms']:.2f}"
+        if base is not None and stage in base['stages']:
+            old = base['stages'][stage]['ms_per_frame']
+            line += f"  ({(ms / old - 1) * 100 if old > 0 else 0.0:+.0f}%)"
+        print(line)
+
+
+def parse_resolution(value: str):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline audio -> vídeo")
+    parser.add_argument('--fixtures', default=','.join(FIXTURES),
+                        help=f"Audios sintéticos a usar ({', '.join(FIXTURES)})")
+    parser.add_argument('--resolutions', default='640x360,1280x720,1920x1080')
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--duration', type=float, default=None,
+                        help="Duración de los audios en segundos (por defecto la de cada fixture)")
+    parser.add_argument('--max-frames', type=int, default=150,
+                        help="Frames renderizados por caso (0 = todo el audio)")
+    parser.add_argument('--encoder', choices=('ffmpeg', 'opencv'), default='ffmpeg')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rasterizers', default='opencv',
+                        help=f"Backends de dibujado a medir ({', '.join(RASTERIZERS)})")
+    parser.add_argument('--fixtures-dir', default=default_cache_dir('benchmark_fixtures'))
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=None, help="JSON de una ejecución anterior para comparar")
+    parser.add_argument('--save-baseline', default=None, help="Guardar también los resultados como baseline")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="Empeoramiento relativo tolerado en tiempos y fps")
+    parser.add_argument('--rss-threshold', type=float, default=0.25,
+                        help="Aumento relativo tolerado de memoria máxima")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = {
+        'fixtures': args.fixtures.split(','),
+        'resolutions': args.resolutions.split(','),
+        'fps': args.fps,
+        'duration': args.duration,
+        'max_frames': args.max_frames,
+        'encoder': args.encoder,
+        'seed': args.seed,
+        'rasterizers': args.rasterizers.split(','),
+    }
+    unknown = [name for name in config['rasterizers'] if name not in RASTERIZERS]
+    if unknown:
+        print(f"Rasterizador desconocido: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {'environment': environment(), 'config': config, 'cases': {}}
+    # Un proceso nuevo por caso para que la memoria máxima sea solo la suya
+    context = multiprocessing.get_context('spawn')
+    for fixture in config['fixtures']:
+        audio_path = make_fixture(fixture, args.fixtures_dir, args.duration, args.seed)
+        for resolution in config['resolutions']:
+            width, height = parse_resolution(resolution)
+            for rasterizer in config['rasterizers']:
+                # El backend por defecto conserva los nombres de caso de baselines anteriores
+                name = f"{fixture}@{width}x{height}" + ("" if rasterizer == 'opencv' else f"/{rasterizer}")
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    case = executor.submit(run_case, audio_path, width, height, args.fps,
+                                           args.max_frames, args.encoder, args.seed, rasterizer).result()
+                case.update(fixture=fixture, width=width, height=height, rasterizer=rasterizer)
+                results['cases'][name] = case
+                print_case(name, case, baseline['cases'].get(name) if baseline else None)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+    print(f"\nResultados guardados en {args.output}")
+
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, args.threshold, args.rss_threshold)
+    if regressions:
+        print("\nRegresiones respecto al baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("\nSin regresiones respecto al baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import argparse
+import os
+import sys
+import time
+from src.render.job import RenderOptions, RenderResult
+from src.render.queue import RenderQueue, collect_audio_files, plan_jobs
+from src.video.raster import RASTERIZERS
+
+def parse_frame_range(value: str):
+    start, end = value.split(':')
+    return int(start), int(end)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Genera vídeos musicales sin interfaz gráfica a partir de uno o varios audios."
+    )
+    parser.add_argument('inputs', nargs='+',
+                        help="Archivos de audio, directorios o patrones glob (p. ej. 'musica/**/*.mp3')")
+    parser.add_argument('-o', '--output-dir', default=os.path.dirname(os.path.abspath(__file__)),
+                        help="Directorio base; los vídeos se guardan en <dir>/output")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Número de vídeos que se generan a la vez")
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--formats', default='',
+                        help="Formatos de salida separados por comas (1080p, 720p, 480p, 9:16, 1:1 o ANCHOxALTO); "
+                             "se generan todos con una sola simulación de --width x --height")
+    parser.add_argument('--encoder', choices=('ffmpeg', 'opencv'), default='ffmpeg')
+    parser.add_argument('--preset', default='medium', help="Preset de libx264")
+    parser.add_argument('--crf', type=int, default=23, help="Calidad de libx264 (menor = mejor)")
+    parser.add_argument('--threads', type=int, default=0, help="Hilos del codificador (0 = automático)")
+    parser.add_argument('--render-workers', type=int, default=1,
+                        help="Procesos de dibujado por vídeo")
+    parser.add_argument('--rasterizer', choices=tuple(RASTERIZERS), default='opencv',
+                        help="Backend de dibujado de las partículas")
+    parser.add_argument('--pipeline-depth', type=int, default=0,
+                        help="Mezclar y codificar en hilos propios con como mucho N frames en vuelo (0 = secuencial)")
+    parser.add_argument('--seed', type=int, default=None, help="Semilla de la simulación (por defecto, derivada del contenido del audio)")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Análisis por bloques con memoria acotada (audios largos)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="No usar ninguna caché (características, audio decodificado ni vídeos)")
+    parser.add_argument('--no-render-cache', action='store_true',
+                        help="Renderizar de nuevo aunque el vídeo ya esté en la caché")
+    parser.add_argument('--max-particles', type=int, default=None,
+                        help="Presupuesto de partículas vivas (se descartan las menos visibles)")
+    parser.add_argument('--max-trail-points', type=int, default=None,
+                        help="Presupuesto de puntos de estela (se descartan los más antiguos)")
+    parser.add_argument('--target-fps', type=float, default=None,
+                        help="Velocidad de renderizado objetivo; reduce el detalle si no se alcanza")
+    parser.add_argument('--timeline-dir', default=None,
+                        help="Guardar tiempos por etapa y frame (JSON, CSV y resumen) en este directorio")
+    parser.add_argument('--profile-frames', type=parse_frame_range, default=None, metavar='INICIO:FIN',
+                        help="Perfilar con cProfile los frames [INICIO, FIN) y guardar un .prof")
+    parser.add_argument('--start', type=float, default=None, help="Renderizar desde este segundo")
+    parser.add_argument('--end', type=float, default=None, help="Renderizar hasta este segundo")
+    parser.add_argument('--checkpoint-dir', default=None,
+                        help="Guardar checkpoints aquí y reanudar renderizados interrumpidos")
+    parser.add_argument('--checkpoint-every', type=float, default=60.0,
+                        help="Segundos de vídeo entre checkpoints")
+    return parser.parse_args(argv)
+
+
+def print_result(result: RenderResult):
+    name = os.path.basename(result.job.audio_path)
+    if result.success:
+        paths = ', '.join(o.path for o in result.job.outputs) or result.job.output_path
+        source = ", caché" if result.cached else ""
+        print(f"[OK]    {name} -> {paths} ({result.elapsed:.1f}s{source})")
+    else:
+        print(f"[ERROR] {name}: {result.error} ({result.elapsed:.1f}s)")
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    audio_files = collect_audio_files(args.inputs)
+    if not audio_files:
+        print("No se encontraron archivos de audio.", file=sys.stderr)
+        return 1
+
+    options = RenderOptions(
+        width=args.width, height=args.height, fps=args.fps,
+        encoder=args.encoder, preset=args.preset, crf=args.crf, threads=args.threads,
+        render_workers=args.render_workers, rasterizer=args.rasterizer,
+        pipeline_depth=args.pipeline_depth, seed=args.seed,
+        streaming=args.streaming, use_cache=not args.no_cache,
+        use_render_cache=not args.no_render_cache,
+        timeline_dir=args.timeline_dir, profile_frames=args.profile_frames,
+        max_particles=args.max_particles, max_trail_points=args.max_trail_points,
+        target_fps=args.target_fps,
+        formats=tuple(f for f in args.formats.split(',') if f),
+        start_time=args.start, end_time=args.end,
+        checkpoint_dir=args.checkpoint_dir, checkpoint_interval=args.checkpoint_every
+    )
+
+    queue = RenderQueue(args.jobs)
+    try:
+        jobs = plan_jobs(audio_files, args.output_dir, options)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    for job in jobs:
+        queue.add(job)
+
+    print(f"Generando {len(audio_files)} vídeo(s) con {queue.workers} trabajo(s) en paralelo...")
+    start = time.perf_counter()
+    results = queue.run(print_result)
+    total = time.perf_counter() - start
+
+    # Resumen
+    failed = [r for r in results if not r.success]
+    print(f"\nCompletados: {len(results) - len(failed)}  Fallidos: {len(failed)}  "
+          f"Tiempo total: {total:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+import argparse
+from src.preview.player import PreviewPlayer
+from src.video.raster import RASTERIZERS
+
+def main():
+    parser = argparse.ArgumentParser(description="Vista previa en tiempo real con el audio sincronizado")
+    parser.add_argument('audio', help="Archivo de audio")
+    parser.add_argument('--width', type=int, default=1920, help="Ancho del vídeo final que se simula")
+    parser.add_argument('--height', type=int, default=1080, help="Alto del vídeo final que se simula")
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--scale', type=float, default=1 / 3,
+                        help="Resolución de dibujado relativa al vídeo final")
+    parser.add_argument('--seed', type=int, default=None, help="Semilla (por defecto, la misma que el renderizado)")
+    parser.add_argument('--rasterizer', choices=tuple(RASTERIZERS), default='opencv',
+                        help="Backend de dibujado de las partículas")
+    parser.add_argument('--no-cache', action='store_true', help="No usar la caché de características")
+    args = parser.parse_args()
+
+    PreviewPlayer(args.audio, args.width, args.height, args.fps, scale=args.scale,
+                  seed=args.seed, use_cache=not args.no_cache, rasterizer=args.rasterizer).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+from typing import Dict, Optional
+
+def default_cache_dir(name: str) -> str:
+    """Directorio de caché: $MUSIFAZER_CACHE_DIR o ~/.cache/musifazer"""
+    base = os.environ.get('MUSIFAZER_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'musifazer')
+    return os.path.join(base, name)
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """Hash del contenido del archivo (no de su nombre ni de su fecha)"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """Caché en disco de características de audio direccionada por contenido.
+
+    Cada característica se guarda en su propio `.npz` (`<clave>.<nombre>.npz`),
+    así que calcular una nueva solo escribe ese archivo. La clave combina el
+    hash del archivo, los parámetros de análisis y la versión del análisis;
+    cambiar cualquiera de ellos produce otra clave, y los archivos antiguos
+    acaban expulsados por LRU cuando el directorio supera `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir or default_cache_dir('features')
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, audio_path: str, params: Dict, audio_hash: Optional[str] = None) -> str:
+        # `audio_hash`: file_hash(audio_path) si ya se calculó
+        description = json.dumps(params, sort_keys=True)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update((audio_hash or file_hash(audio_path)).encode())
+        digest.update(description.encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str, name: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{name}.npz")
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Las características guardadas para `key` (puede faltar alguna), o None si no hay ninguna"""
+        features = {}
+        for path in glob.glob(os.path.join(self.cache_dir, f"{key}.*.npz")):
+            name = os.path.basename(path)[len(key) + 1:-len('.npz')]
+            try:
+                with np.load(path, allow_pickle=False) as data:
+                    value = data['value']
+                os.utime(path)  # Marcar como usada recientemente
+            except (OSError, ValueError, KeyError):
+                # Archivo corrupto o expulsado por otro proceso: se volverá a calcular
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            features[name] = value.item() if value.ndim == 0 else value
+        return features or None
+
+    def put(self, key: str, features: Dict):
+        """Guarda las características de `features` que aún no estén en disco"""
+        written = False
+        for name, value in features.items():
+            path = self._path(key, name)
+            if os.path.exists(path):
+                continue
+            fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.savez_compressed(f, value=np.asarray(value))
+                os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            written = True
+        if written:
+            self.evict()
+
+    def evict(self):
+        """Elimina las entradas menos usadas hasta quedar por debajo de `max_bytes`"""
+        # Otros procesos pueden estar expulsando a la vez: ignorar lo que ya no existe
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            # También las entradas de un solo .npz de versiones anteriores
+            if name.endswith('.npz'):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
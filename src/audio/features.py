@@ -0,0 +1,125 @@
+import librosa
+import numpy as np
+from collections.abc import Mapping
+from typing import Callable, Dict, Optional
+from .pcm import PCMCache
+
+class AudioFeatures(Mapping):
+    """Características de audio calculadas bajo demanda.
+
+    Se comporta como el diccionario que devolvía `process_audio`, pero cada
+    característica se calcula solo la primera vez que alguien la pide. El
+    espectrograma de magnitud se calcula una única vez y de él salen el
+    centroide, el rolloff, el cromagrama y la envolvente de onsets del
+    seguimiento de beats.
+    """
+
+    N_FFT = 2048
+    HOP_LENGTH = 512
+
+    def __init__(self, audio_path: str, sample_rate: Optional[int] = 22050,
+                 precomputed: Optional[Dict] = None,
+                 on_update: Optional[Callable[[Dict], None]] = None,  # recibe solo lo recién calculado
+                 pcm_cache: Optional[PCMCache] = None):
+        self.audio_path = audio_path
+        self.sample_rate = sample_rate
+        self.on_update = on_update
+        # Con caché de PCM el audio se decodifica una vez y se lee mapeado en memoria
+        self.pcm_cache = pcm_cache
+        self._values: Dict = dict(precomputed or {})
+        self._y = None
+        self._sr = None
+        self._magnitude = None
+        self._compute = {
+            'tempo': self._beats,
+            'beat_frames': self._beats,
+            'spectral_centroids': self._spectral_centroids,
+            'spectral_rolloff': self._spectral_rolloff,
+            'chromagram': self._chromagram,
+            'rms': self._rms,
+            'duration': self._duration,
+            'sample_rate': self._sample_rate,
+        }
+
+    # Interfaz de diccionario
+    def __getitem__(self, name: str):
+        if name == 'audio_path':
+            return self.audio_path
+        if name not in self._values:
+            if name not in self._compute:
+                raise KeyError(name)
+            values = self._compute[name]()
+            self._values.update(values)
+            if self.on_update is not None:
+                self.on_update(values)
+        return self._values[name]
+
+    def __iter__(self):
+        yield from self._compute
+        yield 'audio_path'
+
+    def __len__(self) -> int:
+        return len(self._compute) + 1
+
+    def computed(self) -> Dict:
+        """Características ya calculadas (sin provocar cálculos nuevos)"""
+        return dict(self._values)
+
+    # Datos intermedios compartidos
+    def _load(self):
+        if self.pcm_cache is not None:
+            self._y, self._sr = self.pcm_cache.load(self.audio_path, self.sample_rate)
+        else:
+            self._y, self._sr = librosa.load(self.audio_path, sr=self.sample_rate)
+
+    @property
+    def y(self) -> np.ndarray:
+        if self._y is None:
+            self._load()
+        return self._y
+
+    @property
+    def sr(self) -> int:
+        if self._sr is None:
+            self._load()
+        return self._sr
+
+    @property
+    def magnitude(self) -> np.ndarray:
+        """Espectrograma de magnitud |STFT|, calculado una sola vez"""
+        if self._magnitude is None:
+            self._magnitude = np.abs(librosa.stft(self.y, n_fft=self.N_FFT, hop_length=self.HOP_LENGTH))
+        return self._magnitude
+
+    # Cálculo de cada característica
+    def _beats(self) -> Dict:
+        # Misma envolvente que onset_strength(y=...), pero sobre el STFT compartido
+        mel = librosa.feature.melspectrogram(S=self.magnitude ** 2, sr=self.sr)
+        onset_envelope = librosa.onset.onset_strength(
+            S=librosa.power_to_db(mel), sr=self.sr, hop_length=self.HOP_LENGTH, aggregate=np.median
+        )
+        tempo, beat_frames = librosa.beat.beat_track(
+            onset_envelope=onset_envelope, sr=self.sr, hop_length=self.HOP_LENGTH
+        )
+        return {'tempo': tempo, 'beat_frames': beat_frames}
+
+    def _spectral_centroids(self) -> Dict:
+        centroids = librosa.feature.spectral_centroid(S=self.magnitude, sr=self.sr, n_fft=self.N_FFT)[0]
+        return {'spectral_centroids': centroids}
+
+    def _spectral_rolloff(self) -> Dict:
+        rolloff = librosa.feature.spectral_rolloff(S=self.magnitude, sr=self.sr, n_fft=self.N_FFT)[0]
+        return {'spectral_rolloff': rolloff}
+
+    def _chromagram(self) -> Dict:
+        return {'chromagram': librosa.feature.chroma_stft(S=self.magnitude ** 2, sr=self.sr, n_fft=self.N_FFT)}
+
+    def _rms(self) -> Dict:
+        rms = librosa.feature.rms(y=self.y, frame_length=self.N_FFT, hop_length=self.HOP_LENGTH)[0]
+        return {'rms': rms}
+
+    def _duration(self) -> Dict:
+        return {'duration': len(self.y) / self.sr}
+
+    def _sample_rate(self) -> Dict:
+        return {'sample_rate': self.sample_rate if self.sample_rate else self.sr}
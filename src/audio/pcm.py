@@ -0,0 +1,160 @@
+import glob
+import os
+import tempfile
+import librosa
+import numpy as np
+import soundfile as sf
+from typing import Dict, NamedTuple, Optional, Tuple
+from .cache import default_cache_dir, file_hash
+
+class PCMAudio(NamedTuple):
+    """Audio decodificado en un .npy de float32 (muestras x canales)"""
+    path: str
+    sample_rate: int
+    channels: int
+    offset: int  # bytes de cabecera antes de las muestras
+
+    def array(self) -> np.ndarray:
+        """Las muestras mapeadas en memoria, sin leerlas"""
+        return np.load(self.path, mmap_mode='r')
+
+
+class PCMCache:
+    """Caché en disco del audio decodificado, compartida entre procesos.
+
+    Cada archivo se decodifica una sola vez a un .npy de float32 con sus
+    canales y frecuencia originales, y de él se derivan (también una vez)
+    las versiones mono remuestreadas que usa el análisis. Todos los
+    consumidores (análisis, vista previa, mezcla de audio y procesos
+    paralelos) abren los .npy con `np.load(mmap_mode='r')`, sin copiarlos.
+    Las entradas se direccionan por el hash del contenido y se expulsan
+    por LRU cuando el directorio supera `max_bytes`.
+    """
+
+    BLOCK_FRAMES = 1 << 18  # muestras por bloque al decodificar
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 2 * 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir or default_cache_dir('pcm')
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._hashes: Dict[Tuple, str] = {}
+
+    def key(self, audio_path: str, audio_hash: Optional[str] = None) -> str:
+        # Hashear el archivo una vez por proceso mientras no cambie
+        # (con `audio_hash`, el file_hash ya calculado, solo se recuerda)
+        stat = os.stat(audio_path)
+        ident = (os.path.abspath(audio_path), stat.st_size, stat.st_mtime_ns)
+        if ident not in self._hashes:
+            self._hashes[ident] = audio_hash or file_hash(audio_path)
+        return self._hashes[ident]
+
+    def _open(self, path: str) -> Optional[np.ndarray]:
+        try:
+            array = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # Marcar como usada recientemente
+        except FileNotFoundError:
+            pass  # Expulsada por otro proceso; el mapeo sigue siendo válido
+        return array
+
+    def native(self, audio_path: str) -> PCMAudio:
+        """El audio a su frecuencia nativa, decodificándolo si no está en caché"""
+        key = self.key(audio_path)
+        for path in glob.glob(os.path.join(self.cache_dir, f"{key}_*_native.npy")):
+            array = self._open(path)
+            if array is not None:
+                sample_rate = int(os.path.basename(path).split('_')[1])
+                return PCMAudio(path, sample_rate, array.shape[1], array.offset)
+
+        sample_rate, path = self._decode(audio_path, key)
+        self.evict(keep=path)
+        array = np.load(path, mmap_mode='r')
+        return PCMAudio(path, sample_rate, array.shape[1], array.offset)
+
+    def load(self, audio_path: str, sample_rate: Optional[int] = 22050) -> Tuple[np.ndarray, int]:
+        """Como `librosa.load`: audio mono a `sample_rate` (None = nativa), mapeado en memoria"""
+        key = self.key(audio_path)
+        if sample_rate is not None:
+            array = self._open(self._mono_path(key, sample_rate))
+            if array is not None:
+                return array, sample_rate
+
+        source = self.native(audio_path)
+        if sample_rate is None:
+            sample_rate = source.sample_rate
+            array = self._open(self._mono_path(key, sample_rate))
+            if array is not None:
+                return array, sample_rate
+
+        # Mezclar a mono y remuestrear igual que librosa.load
+        y = librosa.to_mono(source.array().T)
+        if sample_rate != source.sample_rate:
+            y = librosa.resample(y, orig_sr=source.sample_rate, target_sr=sample_rate)
+        path = self._mono_path(key, sample_rate)
+        self._write(path, lambda temp_path: np.save(temp_path, np.ascontiguousarray(y, dtype=np.float32)))
+        self.evict(keep=path)
+        return np.load(path, mmap_mode='r'), sample_rate
+
+    def _mono_path(self, key: str, sample_rate: int) -> str:
+        return os.path.join(self.cache_dir, f"{key}_{sample_rate}_mono.npy")
+
+    def _decode(self, audio_path: str, key: str) -> Tuple[int, str]:
+        """Decodifica el archivo por bloques directamente a su .npy"""
+        try:
+            with sf.SoundFile(audio_path) as f:
+                sample_rate = f.samplerate
+                path = os.path.join(self.cache_dir, f"{key}_{sample_rate}_native.npy")
+
+                def write(temp_path):
+                    out = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.float32,
+                                                    shape=(f.frames, f.channels))
+                    position = 0
+                    for block in f.blocks(self.BLOCK_FRAMES, dtype='float32', always_2d=True):
+                        out[position:position + len(block)] = block
+                        position += len(block)
+                    out.flush()
+                    del out
+
+                self._write(path, write)
+        except RuntimeError:
+            # Formatos que libsndfile no lee (m4a...): decodificar con librosa
+            y, sample_rate = librosa.load(audio_path, sr=None, mono=False)
+            path = os.path.join(self.cache_dir, f"{key}_{sample_rate}_native.npy")
+            samples = np.atleast_2d(y).T
+            self._write(path, lambda temp_path: np.save(temp_path, np.ascontiguousarray(samples, dtype=np.float32)))
+        return sample_rate, path
+
+    def _write(self, path: str, write):
+        # Escritura atómica: otro proceso nunca ve un .npy a medias
+        fd, temp_path = tempfile.mkstemp(suffix='.npy', dir=self.cache_dir)
+        os.close(fd)
+        try:
+            write(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def evict(self, keep: Optional[str] = None):
+        """Elimina las entradas menos usadas hasta quedar por debajo de `max_bytes` (salvo `keep`)"""
+        # Otros procesos pueden estar expulsando a la vez: ignorar lo que ya no existe
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(('_native.npy', '_mono.npy')) and os.path.join(self.cache_dir, name) != keep:
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
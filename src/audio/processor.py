@@ -1,43 +1,91 @@
-import librosa
 import numpy as np
-from typing import Tuple, Dict
+from typing import Dict, Optional
+from .cache import FeatureCache
+from .features import AudioFeatures
+from .pcm import PCMCache
+from .streaming import StreamingAnalyzer
+
+# Incrementar cuando cambie cómo se calculan las características (invalida la caché)
+ANALYSIS_VERSION = 1
+
+# Características que el modo streaming calcula sin cargar el archivo completo
+STREAMED_FEATURES = ('rms', 'spectral_centroids', 'spectral_rolloff', 'duration', 'sample_rate')
 
 class AudioProcessor:
-    def __init__(self, audio_path: str):
+    def __init__(self, audio_path: str, sample_rate: Optional[int] = 22050,
+                 cache: Optional[FeatureCache] = None, streaming: bool = False,
+                 block_frames: int = 2048, pcm_cache: Optional[PCMCache] = None,
+                 audio_hash: Optional[str] = None):
         self.audio_path = audio_path
-        self.y = None
-        self.sr = None
-        self.tempo = None
-        self.beat_frames = None
-        self.spectral_centroids = None
-        self.spectral_rolloff = None
-        
-    def process_audio(self) -> Dict:
-        """Procesa el archivo de audio y extrae características"""
-        # Cargar archivo de audio
-        self.y, self.sr = librosa.load(self.audio_path)
-        
-        # Obtener tempo y beats
-        self.tempo, self.beat_frames = librosa.beat.beat_track(y=self.y, sr=self.sr)
-        
-        # Obtener características espectrales
-        self.spectral_centroids = librosa.feature.spectral_centroid(y=self.y, sr=self.sr)[0]
-        self.spectral_rolloff = librosa.feature.spectral_rolloff(y=self.y, sr=self.sr)[0]
+        # None = frecuencia de muestreo nativa del archivo (sin remuestrear)
+        self.sample_rate = sample_rate
+        self.cache = cache
+        # En modo streaming el audio se analiza por bloques con memoria acotada
+        self.streaming = streaming
+        self.block_frames = block_frames
+        self.pcm_cache = pcm_cache
+        # file_hash del audio si ya se calculó (evita volver a leer el archivo)
+        self.audio_hash = audio_hash
+        if pcm_cache is not None and audio_hash is not None:
+            pcm_cache.key(audio_path, audio_hash)
+        self.features: Optional[AudioFeatures] = None
+    
+    # Accesos directos a las características (se calculan al pedirlas)
+    @property
+    def y(self) -> Optional[np.ndarray]:
+        return self.features.y if self.features is not None else None
+    
+    @property
+    def sr(self) -> Optional[int]:
+        return self.features['sample_rate'] if self.features is not None else None
+    
+    @property
+    def tempo(self):
+        return self.features['tempo'] if self.features is not None else None
+    
+    @property
+    def beat_frames(self) -> Optional[np.ndarray]:
+        return self.features['beat_frames'] if self.features is not None else None
+    
+    @property
+    def spectral_centroids(self) -> Optional[np.ndarray]:
+        return self.features['spectral_centroids'] if self.features is not None else None
+    
+    @property
+    def spectral_rolloff(self) -> Optional[np.ndarray]:
+        return self.features['spectral_rolloff'] if self.features is not None else None
+    
+    def _analysis_params(self) -> Dict:
+        return {'version': ANALYSIS_VERSION, 'sample_rate': self.sample_rate}
+    
+    def process_audio(self) -> AudioFeatures:
+        """Prepara las características del audio; cada una se calcula al pedirla.
         
-        # Obtener cromagrama
-        chromagram = librosa.feature.chroma_stft(y=self.y, sr=self.sr)
+        Con caché, las características ya calculadas se leen del disco sin
+        decodificar el audio, y las nuevas se guardan en cuanto se calculan.
+        En modo streaming, las series que usa el renderizado se calculan por
+        bloques sin cargar el archivo completo (salvo en formatos que
+        soundfile no lee, que se analizan enteros).
+        """
+        key = self.cache.key(self.audio_path, self._analysis_params(), self.audio_hash) if self.cache else None
+        precomputed = dict(self.cache.get(key) or {}) if self.cache else {}
         
-        # Obtener energía por frame
-        rms = librosa.feature.rms(y=self.y)[0]
+        if self.streaming and not all(name in precomputed for name in STREAMED_FEATURES):
+            try:
+                analyzer = StreamingAnalyzer(self.audio_path, self.sample_rate, self.block_frames)
+            except RuntimeError:
+                # Formatos que libsndfile no lee (m4a...): se analiza el archivo completo
+                analyzer = None
+            if analyzer is not None:
+                precomputed.update(analyzer.analyze())
+                if self.cache:
+                    self.cache.put(key, precomputed)
         
-        return {
-            'tempo': self.tempo,
-            'beat_frames': self.beat_frames,
-            'spectral_centroids': self.spectral_centroids,
-            'spectral_rolloff': self.spectral_rolloff,
-            'chromagram': chromagram,
-            'rms': rms,
-            'duration': len(self.y) / self.sr,
-            'sample_rate': self.sr,
-            'audio_path': self.audio_path
-        } 
\ No newline at end of file
+        self.features = AudioFeatures(
+            self.audio_path,
+            self.sample_rate,
+            precomputed=precomputed,
+            on_update=(lambda values: self.cache.put(key, values)) if self.cache else None,
+            pcm_cache=self.pcm_cache
+        )
+        return self.features
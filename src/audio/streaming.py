@@ -0,0 +1,95 @@
+import librosa
+import numpy as np
+import soundfile as sf
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional
+
+@dataclass
+class FeatureBlock:
+    """Características de un bloque consecutivo de frames de análisis"""
+    start_frame: int
+    rms: np.ndarray
+    spectral_centroids: np.ndarray
+    spectral_rolloff: np.ndarray
+
+
+class StreamingAnalyzer:
+    """Análisis de audio por bloques con memoria acotada.
+
+    Decodifica el archivo en bloques de `block_frames` frames de análisis y
+    calcula RMS, centroide y rolloff de cada bloque. Los frames coinciden con
+    los de un STFT centrado sobre la señal completa, pero nunca se guarda
+    más de un bloque de audio en memoria. Con `sample_rate=None` se trabaja
+    a la frecuencia nativa del archivo y no se remuestrea.
+    """
+
+    N_FFT = 2048
+    HOP_LENGTH = 512
+
+    def __init__(self, audio_path: str, sample_rate: Optional[int] = None, block_frames: int = 2048):
+        self.audio_path = audio_path
+        self.block_frames = max(1, block_frames)
+        info = sf.info(audio_path)
+        self.native_rate = info.samplerate
+        self.sr = sample_rate or info.samplerate
+        self.duration = info.frames / info.samplerate
+
+    def _samples(self) -> Iterator[np.ndarray]:
+        """Bloques de audio mono (remuestreados si hace falta)"""
+        resampler = None
+        if self.sr != self.native_rate:
+            import soxr
+            resampler = soxr.ResampleStream(self.native_rate, self.sr, 1, dtype='float32')
+        blocksize = self.block_frames * self.HOP_LENGTH
+        with sf.SoundFile(self.audio_path) as f:
+            for block in f.blocks(blocksize=blocksize, dtype='float32', always_2d=True):
+                mono = block.mean(axis=1)
+                if resampler is not None:
+                    mono = resampler.resample_chunk(mono)
+                yield mono
+            if resampler is not None:
+                yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+
+    def _frame_chunks(self) -> Iterator[np.ndarray]:
+        """Trozos de señal que contienen frames completos, como un STFT centrado"""
+        pad = np.zeros(self.N_FFT // 2, dtype=np.float32)
+        buffer = pad
+        total = 0
+        for samples in self._samples():
+            total += len(samples)
+            buffer = np.concatenate([buffer, samples])
+            n_frames = (len(buffer) - self.N_FFT) // self.HOP_LENGTH + 1
+            if n_frames >= self.block_frames:
+                yield buffer[:(n_frames - 1) * self.HOP_LENGTH + self.N_FFT]
+                buffer = buffer[n_frames * self.HOP_LENGTH:]
+
+        # Cola final con el relleno del centrado (1 + total // hop frames en total)
+        buffer = np.concatenate([buffer, pad])
+        if len(buffer) >= self.N_FFT:
+            yield buffer
+
+    def blocks(self) -> Iterator[FeatureBlock]:
+        """Genera las características bloque a bloque, según se van decodificando"""
+        start = 0
+        for chunk in self._frame_chunks():
+            magnitude = np.abs(librosa.stft(chunk, n_fft=self.N_FFT, hop_length=self.HOP_LENGTH, center=False))
+            frames = librosa.util.frame(chunk, frame_length=self.N_FFT, hop_length=self.HOP_LENGTH)
+            block = FeatureBlock(
+                start_frame=start,
+                rms=np.sqrt(np.mean(frames ** 2, axis=0)),
+                spectral_centroids=librosa.feature.spectral_centroid(S=magnitude, sr=self.sr, n_fft=self.N_FFT)[0],
+                spectral_rolloff=librosa.feature.spectral_rolloff(S=magnitude, sr=self.sr, n_fft=self.N_FFT)[0],
+            )
+            start += magnitude.shape[1]
+            yield block
+
+    def analyze(self) -> Dict:
+        """Recorre el archivo completo y devuelve las series de características"""
+        blocks = list(self.blocks())
+        return {
+            'rms': np.concatenate([b.rms for b in blocks]),
+            'spectral_centroids': np.concatenate([b.spectral_centroids for b in blocks]),
+            'spectral_rolloff': np.concatenate([b.spectral_rolloff for b in blocks]),
+            'duration': self.duration,
+            'sample_rate': self.sr,
+        }
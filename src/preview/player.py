@@ -0,0 +1,246 @@
+import time
+import cv2
+import numpy as np
+import pygame
+from typing import Optional
+from ..audio.cache import FeatureCache, file_hash
+from ..audio.pcm import PCMAudio, PCMCache
+from ..audio.processor import AudioProcessor
+from ..render.cache import default_seed
+from ..video.compositor import FrameCompositor
+from ..video.control import ControlTrack
+from ..video.particles import ParticleSystem
+
+# Niveles de calidad de menor a mayor coste: (escala de dibujado, brillo, estelas)
+QUALITY_LEVELS = (
+    (0.5, False, False),
+    (0.75, False, True),
+    (1.0, False, True),
+    (1.0, True, True),
+)
+
+class AudioClock:
+    """Reloj de reproducción: la posición del audio en pygame o, sin audio, el tiempo real.
+
+    Con `pcm` se reproduce el audio ya decodificado de la caché en lugar de
+    decodificar el archivo otra vez (y se reproducen también formatos que
+    pygame no sabe leer). El PCM se lee del .npy por trozos de
+    CHUNK_SECONDS, así que en memoria solo hay el trozo que suena y el
+    siguiente. Si el dispositivo no acepta su formato, se reproduce el
+    archivo con pygame.
+    """
+
+    CHUNK_SECONDS = 5.0
+
+    def __init__(self, audio_path: str, pcm: Optional[PCMAudio] = None):
+        self.audio_path = audio_path
+        self.pcm = pcm
+        self.has_audio = False
+        self._channel = None
+        self._samples = None
+        self._next = 0
+        self._start = None
+
+    def start(self):
+        try:
+            if self.pcm is None or not self._start_pcm():
+                pygame.mixer.init()
+                pygame.mixer.music.load(self.audio_path)
+                pygame.mixer.music.play()
+            self.has_audio = True
+        except pygame.error:
+            # Formato no soportado o sin dispositivo de audio: seguir en silencio
+            self.has_audio = False
+        self._start = time.perf_counter()
+
+    def _start_pcm(self) -> bool:
+        """Empieza a reproducir el PCM; False si el mezclador no acepta su formato"""
+        # float32 con la frecuencia y los canales del PCM; allowedchanges=0 impide que
+        # el dispositivo imponga otro formato y los bytes se interpreten mal
+        try:
+            pygame.mixer.init(frequency=self.pcm.sample_rate, size=32, channels=self.pcm.channels,
+                              allowedchanges=0)
+        except pygame.error:
+            return False
+        frequency, size, channels = pygame.mixer.get_init()
+        if (frequency, abs(size), channels) != (self.pcm.sample_rate, 32, self.pcm.channels):
+            pygame.mixer.quit()
+            return False
+        self._samples = self.pcm.array()
+        self._next = 0
+        self._channel = self._next_chunk().play()
+        self._feed()
+        return True
+
+    def _next_chunk(self) -> pygame.mixer.Sound:
+        end = self._next + int(self.CHUNK_SECONDS * self.pcm.sample_rate)
+        chunk = np.ascontiguousarray(self._samples[self._next:end])
+        self._next = end
+        return pygame.mixer.Sound(buffer=chunk)
+
+    def _feed(self):
+        # Dejar el siguiente trozo en cola para que suene sin cortes tras el actual
+        if self._next < len(self._samples) and self._channel.get_queue() is None:
+            self._channel.queue(self._next_chunk())
+
+    def position(self) -> Optional[float]:
+        """Segundos reproducidos, o None si el audio ya terminó"""
+        if not self.has_audio:
+            return time.perf_counter() - self._start
+        if self._channel is not None:
+            # Un Sound no informa de su posición: contar desde que empezó a sonar
+            if not self._channel.get_busy():
+                return None
+            self._feed()
+            return time.perf_counter() - self._start
+        if not pygame.mixer.music.get_busy():
+            return None
+        return pygame.mixer.music.get_pos() / 1000.0
+
+    def stop(self):
+        if self.has_audio:
+            if self._channel is not None:
+                self._channel.stop()
+            else:
+                pygame.mixer.music.stop()
+            pygame.mixer.quit()
+
+
+class PreviewPlayer:
+    """Vista previa en tiempo real con el audio sincronizado.
+
+    La simulación corre a la resolución del vídeo final (para que el
+    movimiento sea el mismo) pero se dibuja a `scale` veces ese tamaño y
+    se amplía a la ventana. El frame que se muestra lo marca la posición
+    del audio: si el dibujado se retrasa, los frames intermedios solo se
+    simulan y se baja la calidad; si sobra tiempo, se sube.
+    """
+
+    def __init__(self, audio_path: str, width: int = 1920, height: int = 1080, fps: int = 30,
+                 scale: float = 1 / 3, window_size: Optional[tuple] = None, seed: Optional[int] = None,
+                 use_cache: bool = True, rasterizer: str = 'opencv'):
+        self.audio_path = audio_path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.scale = scale
+        self.window_size = window_size or (int(width * scale), int(height * scale))
+        self.seed = seed
+        self.use_cache = use_cache
+        self.rasterizer = rasterizer
+        self.quality = len(QUALITY_LEVELS) - 1
+        self._compositors = {}
+        self._compositor_size = None
+        self._frames_since_change = 0
+
+    def _compositor(self, draw_scale: float) -> FrameCompositor:
+        """Compositor para el tamaño de dibujado actual (se conserva al cambiar de calidad)"""
+        size = (max(1, int(self.width * draw_scale)), max(1, int(self.height * draw_scale)))
+        compositor = self._compositors.get(size)
+        if compositor is None:
+            compositor = self._compositors[size] = FrameCompositor(*size)
+        if size != self._compositor_size:
+            # Su frame anterior es de hace tiempo: no mezclar con él
+            compositor.reset()
+            self._compositor_size = size
+        return compositor
+
+    def _adapt_quality(self, render_time: float, behind: int):
+        """Baja la calidad si no da tiempo a dibujar cada frame y la sube si sobra"""
+        # Esperar medio segundo entre cambios para que la media refleje el nivel actual
+        self._frames_since_change += 1
+        if self._frames_since_change < self.fps // 2:
+            return
+        budget = 1.0 / self.fps
+        if (behind > 0 or render_time > budget * 0.9) and self.quality > 0:
+            self.quality -= 1
+            self._frames_since_change = 0
+        elif behind == 0 and render_time < budget * 0.4 and self.quality < len(QUALITY_LEVELS) - 1:
+            self.quality += 1
+            self._frames_since_change = 0
+
+    def _render(self, system: ParticleSystem, blend_factor: float) -> np.ndarray:
+        level_scale, glow, trails = QUALITY_LEVELS[self.quality]
+        draw_scale = self.scale * level_scale
+        compositor = self._compositor(draw_scale)
+        frame = compositor.canvas()
+        if trails:
+            system.draw_trails(frame, dirty=compositor.dirty, scale=draw_scale)
+        batch = system.prepare_draw(scale=draw_scale)
+        system.mark_dirty(batch, compositor.dirty)
+        if glow:
+            system.draw_glow(frame, batch)
+        system.draw_shapes(frame, batch)
+        return compositor.compose(frame, blend_factor)
+
+    def run(self):
+        # El audio se hashea una vez para la semilla y las cachés
+        audio_hash = file_hash(self.audio_path) if self.seed is None or self.use_cache else None
+        pcm_cache = PCMCache() if self.use_cache else None
+        features = AudioProcessor(self.audio_path, cache=FeatureCache() if self.use_cache else None,
+                                  pcm_cache=pcm_cache, audio_hash=audio_hash).process_audio()
+        track = ControlTrack.from_features(features, self.fps)
+        # Misma semilla por defecto que el renderizado: la vista previa muestra el mismo vídeo
+        seed = self.seed if self.seed is not None else default_seed(audio_hash)
+        system = ParticleSystem(self.width, self.height, seed=seed, rasterizer=self.rasterizer)
+
+        pygame.init()
+        screen = pygame.display.set_mode(self.window_size)
+        pygame.display.set_caption("Vista previa")
+        font = pygame.font.SysFont(None, 24)
+        clock = AudioClock(self.audio_path, pcm_cache.native(self.audio_path) if pcm_cache else None)
+
+        frame_num = 0       # siguiente frame a simular
+        dropped = 0
+        shown = []          # instantes en que se mostró cada frame (último segundo)
+        render_time = 0.0   # media móvil del tiempo de dibujado
+        running = True
+        clock.start()
+        try:
+            while running:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                        running = False
+
+                position = clock.position()
+                if position is None or frame_num >= len(track):
+                    break
+                target = min(int(position * self.fps), len(track) - 1)
+                if target < frame_num:
+                    # Vamos por delante del audio: esperar al siguiente frame
+                    time.sleep(min(1.0 / self.fps, max(0.0, frame_num / self.fps - position)))
+                    continue
+
+                # Simular (sin dibujar) los frames que el audio ya ha dejado atrás
+                behind = target - frame_num
+                while frame_num <= target:
+                    control = track[frame_num]
+                    system.create_particles(
+                        int(control['particle_count']),
+                        intensity=float(control['intensity']),
+                        frequency=float(control['frequency']),
+                        energy=float(control['energy']),
+                        note_duration=float(control['note_duration'])
+                    )
+                    system.update(1.0 / self.fps)
+                    frame_num += 1
+                dropped += behind
+
+                start = time.perf_counter()
+                frame = self._render(system, float(track[target]['blend_factor']))
+                render_time = 0.8 * render_time + 0.2 * (time.perf_counter() - start)
+                self._adapt_quality(render_time, behind)
+
+                # Ampliar a la ventana y mostrar con el contador de fps
+                rgb = cv2.cvtColor(cv2.resize(frame, self.window_size, interpolation=cv2.INTER_LINEAR),
+                                   cv2.COLOR_BGR2RGB)
+                screen.blit(pygame.image.frombuffer(rgb.tobytes(), self.window_size, 'RGB'), (0, 0))
+                now = time.perf_counter()
+                shown = [t for t in shown if now - t < 1.0] + [now]
+                status = (f"{len(shown)} fps / {self.fps}  calidad {self.quality + 1}/{len(QUALITY_LEVELS)}"
+                          f"  descartados {dropped}" + ("" if clock.has_audio else "  (sin audio)"))
+                screen.blit(font.render(status, True, (255, 255, 255)), (10, 10))
+                pygame.display.flip()
+        finally:
+            clock.stop()
+            pygame.quit()
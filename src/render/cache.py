@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, Optional
+from ..audio.cache import default_cache_dir
+
+# Incrementar cuando cambie cómo se simula o se dibuja (invalida los vídeos en caché)
+RENDER_VERSION = 1
+
+def default_seed(audio_hash: str) -> int:
+    """Semilla derivada del contenido del audio: el mismo audio da siempre el mismo vídeo"""
+    return int(audio_hash[:8], 16)
+
+
+class RenderCache:
+    """Caché en disco de vídeos terminados, direccionada por contenido.
+
+    La clave combina el hash del audio, la semilla y todos los parámetros
+    que cambian la imagen o la codificación; con la misma clave el vídeo
+    sale idéntico, así que volver a renderizar un audio sin cambios se
+    reduce a copiar el MP4 guardado. Como FeatureCache, expulsa por LRU
+    cuando el directorio supera `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 10 * 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir or default_cache_dir('renders')
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(audio_hash: str, params: Dict) -> str:
+        description = json.dumps({'version': RENDER_VERSION, **params}, sort_keys=True)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(audio_hash.encode())
+        digest.update(description.encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + '.mp4')
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """Copia el vídeo de `key` a `output_path`; False si no está en caché"""
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, output_path)
+            os.utime(path)  # Marcar como usada recientemente
+        except FileNotFoundError:
+            # No está o la acaba de expulsar otro proceso
+            return False
+        return True
+
+    def put(self, key: str, video_path: str):
+        """Guarda una copia del vídeo terminado `video_path`"""
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+        os.close(fd)
+        try:
+            shutil.copyfile(video_path, temp_path)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Elimina los vídeos menos usados hasta quedar por debajo de `max_bytes`"""
+        # Otros procesos pueden estar expulsando a la vez: ignorar lo que ya no existe
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.mp4'):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
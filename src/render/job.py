@@ -0,0 +1,240 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+from ..audio.cache import FeatureCache, file_hash
+from ..audio.pcm import PCMCache
+from ..audio.processor import AudioProcessor
+from ..video.checkpoint import CheckpointStore
+from ..video.generator import OUTPUT_FORMATS, VideoGenerator, VideoOutput
+from ..video.instrument import Instrumentation
+from ..video.lod import LODSettings
+from .cache import RenderCache, default_seed
+
+@dataclass
+class RenderOptions:
+    """Parámetros de un renderizado (vídeo, codificador y análisis)"""
+    width: int = 1920
+    height: int = 1080
+    fps: int = 30
+    encoder: str = 'ffmpeg'
+    preset: str = 'medium'
+    crf: int = 23
+    threads: int = 0
+    render_workers: int = 1
+    rasterizer: str = 'opencv'
+    pipeline_depth: int = 0
+    seed: Optional[int] = None  # None = semilla derivada del contenido del audio
+    streaming: bool = False
+    use_cache: bool = True
+    use_render_cache: bool = True  # reutilizar vídeos ya renderizados con los mismos parámetros
+    # Instrumentación: línea de tiempo por etapas y perfil de un rango de frames
+    timeline_dir: Optional[str] = None
+    profile_frames: Optional[Tuple[int, int]] = None
+    # Nivel de detalle: presupuestos y fps objetivo del regulador de calidad
+    max_particles: Optional[int] = None
+    max_trail_points: Optional[int] = None
+    target_fps: Optional[float] = None
+    # Formatos de salida ('1080p', '9:16', '1280x720'...); vacío = un solo vídeo de width x height
+    formats: Tuple[str, ...] = ()
+    # Tramo a renderizar (segundos) y checkpoints para reanudar renderizados largos
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+    checkpoint_dir: Optional[str] = None
+    checkpoint_interval: float = 60.0  # segundos de vídeo entre checkpoints
+
+
+class RenderCancelled(Exception):
+    """El renderizado se canceló antes de terminar"""
+
+
+class CancelToken:
+    """Cancelación cooperativa: el renderizado la comprueba en cada aviso de progreso"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise RenderCancelled("Renderizado cancelado")
+
+
+def parse_format(name: str) -> Tuple[int, int]:
+    """Resolución de un formato con nombre (OUTPUT_FORMATS) o escrito como ANCHOxALTO"""
+    if name in OUTPUT_FORMATS:
+        return OUTPUT_FORMATS[name]
+    try:
+        width, height = name.lower().split('x')
+        return int(width), int(height)
+    except ValueError:
+        raise ValueError(f"Formato de salida desconocido: {name}")
+
+
+@dataclass
+class RenderJob:
+    audio_path: str
+    output_path: str
+    options: RenderOptions = field(default_factory=RenderOptions)
+    # Con varios formatos, todas las salidas (output_path es la primera)
+    outputs: List[VideoOutput] = field(default_factory=list)
+
+
+@dataclass
+class RenderResult:
+    job: RenderJob
+    success: bool
+    elapsed: float
+    error: Optional[str] = None
+    cached: bool = False
+
+
+def render_params(options: RenderOptions, seed: int, width: int, height: int) -> dict:
+    """Todo lo que determina el vídeo de salida, además del audio"""
+    return {
+        'seed': seed, 'simulation': [options.width, options.height], 'output': [width, height],
+        'fps': options.fps, 'rasterizer': options.rasterizer, 'streaming': options.streaming,
+        'max_particles': options.max_particles, 'max_trail_points': options.max_trail_points,
+        'encoder': options.encoder, 'preset': options.preset, 'crf': options.crf, 'threads': options.threads,
+        'start_time': options.start_time, 'end_time': options.end_time,
+        # Con checkpoints el vídeo se codifica por segmentos que luego se unen
+        'segment_seconds': options.checkpoint_interval if options.checkpoint_dir else None,
+    }
+
+
+def render_audio(audio_path: str, output_path: str,
+                 progress_callback: Callable[[int, str], None],
+                 options: Optional[RenderOptions] = None,
+                 outputs: Optional[List[VideoOutput]] = None,
+                 cancel: Optional[CancelToken] = None,
+                 frame_callback: Optional[Callable[[int, int], None]] = None) -> bool:
+    """Analiza el audio y genera su vídeo; el progreso va de 0 a 100.
+
+    Con `outputs` se generan todos esos vídeos con una sola simulación
+    (en el espacio de options.width x options.height) en lugar de `output_path`.
+    Si se cancela `cancel`, el siguiente aviso de progreso (uno por frame)
+    lanza RenderCancelled: los codificadores se abortan y borran sus
+    archivos a medias.
+
+    Sin semilla explícita se deriva una del contenido del audio, así que
+    el vídeo es reproducible; con la caché de renderizados, los vídeos ya
+    generados con los mismos parámetros se copian sin volver a renderizar.
+    Devuelve True si todas las salidas salieron de la caché.
+    """
+    options = options or RenderOptions()
+    if cancel is not None:
+        report = progress_callback
+
+        def progress_callback(progress: int, status: str):
+            cancel.check()
+            report(progress, status)
+
+    ranged = options.start_time is not None or options.end_time is not None or options.checkpoint_dir
+    if outputs and ranged:
+        raise ValueError("Los tramos y checkpoints solo están disponibles con un formato de salida")
+    targets = outputs or [VideoOutput(output_path, options.width, options.height)]
+
+    seed = options.seed
+    render_cache = None
+    # El regulador de calidad depende del tiempo real y la instrumentación quiere medir: sin caché
+    deterministic = options.target_fps is None and not (options.timeline_dir or options.profile_frames)
+    if options.use_cache and options.use_render_cache and deterministic:
+        render_cache = RenderCache()
+    # El contenido del audio se hashea una sola vez: semilla, caché de vídeos, de características y de PCM
+    audio_hash = None
+    if seed is None or options.use_cache:
+        audio_hash = file_hash(audio_path)
+    if seed is None:
+        seed = default_seed(audio_hash)
+
+    keys = {}
+    if render_cache is not None:
+        keys = {target.path: render_cache.key(audio_hash, render_params(options, seed, target.width, target.height))
+                for target in targets}
+        targets = [target for target in targets if not render_cache.fetch(keys[target.path], target.path)]
+        if not targets:
+            progress_callback(100, "Vídeo recuperado de la caché")
+            return True
+
+    # Procesar audio
+    progress_callback(0, "Procesando audio...")
+    # El audio se decodifica una vez y lo comparten el análisis y la mezcla final
+    pcm_cache = PCMCache() if options.use_cache else None
+    processor = AudioProcessor(
+        audio_path,
+        cache=FeatureCache() if options.use_cache else None,
+        streaming=options.streaming,
+        pcm_cache=pcm_cache,
+        audio_hash=audio_hash
+    )
+    audio_features = processor.process_audio()
+
+    # Generar video
+    progress_callback(20, "Iniciando generación de video...")
+    lod = None
+    if options.max_particles is not None or options.max_trail_points is not None:
+        lod = LODSettings(max_particles=options.max_particles, max_trail_points=options.max_trail_points)
+    generator = VideoGenerator(
+        options.width, options.height, options.fps,
+        encoder=options.encoder, preset=options.preset, crf=options.crf, threads=options.threads,
+        workers=options.render_workers, seed=seed,
+        lod=lod, target_fps=options.target_fps, pipeline_depth=options.pipeline_depth,
+        pcm_cache=pcm_cache, rasterizer=options.rasterizer
+    )
+    scaled_progress = lambda progress, status: progress_callback(20 + int(progress * 0.8), status)
+    if outputs:
+        # Solo las salidas que no estaban en caché
+        generator.generate_videos(audio_features, targets, scaled_progress, frame_callback=frame_callback)
+    else:
+        instrumentation = None
+        if options.timeline_dir or options.profile_frames:
+            report_dir = options.timeline_dir or os.path.dirname(output_path)
+            report_base = os.path.join(report_dir, os.path.splitext(os.path.basename(output_path))[0])
+            os.makedirs(report_dir, exist_ok=True)
+            instrumentation = Instrumentation(options.profile_frames, report_base + '.prof')
+        checkpoints = None
+        if options.checkpoint_dir:
+            checkpoints = CheckpointStore(options.checkpoint_dir, int(options.checkpoint_interval * options.fps))
+        generator.generate_video(
+            audio_features,
+            output_path,
+            scaled_progress,
+            instrumentation=instrumentation,
+            start_time=options.start_time,
+            end_time=options.end_time,
+            checkpoints=checkpoints,
+            frame_callback=frame_callback
+        )
+        
+        if instrumentation is not None and options.timeline_dir:
+            instrumentation.save(report_base + '_timeline.json')
+            instrumentation.save(report_base + '_timeline.csv')
+            with open(report_base + '_summary.txt', 'w') as f:
+                f.write(instrumentation.format_summary() + '\n')
+    
+    if render_cache is not None:
+        for target in targets:
+            render_cache.put(keys[target.path], target.path)
+    return False
+
+
+def run_job(job: RenderJob, progress_callback: Optional[Callable[[int, str], None]] = None) -> RenderResult:
+    """Ejecuta un trabajo y devuelve su resultado sin propagar errores"""
+    start = time.perf_counter()
+    try:
+        cached = render_audio(job.audio_path, job.output_path, progress_callback or (lambda progress, status: None),
+                              job.options, job.outputs)
+        return RenderResult(job, True, time.perf_counter() - start, cached=cached)
+    except Exception as e:
+        # No dejar salidas a medias
+        for path in [job.output_path] + [output.path for output in job.outputs]:
+            if os.path.exists(path):
+                os.remove(path)
+        return RenderResult(job, False, time.perf_counter() - start, str(e) or type(e).__name__)
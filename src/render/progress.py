@@ -0,0 +1,54 @@
+import time
+from collections import deque
+from typing import Callable, Optional
+
+class ProgressReporter:
+    """Limita los avisos de progreso y calcula la velocidad y el tiempo restante.
+
+    El renderizado avisa en cada frame; aquí solo se reenvía un aviso
+    cuando cambia el porcentaje o han pasado `interval` segundos desde el
+    anterior. La velocidad es la media de los últimos `window` segundos.
+    `callback(progreso, estado, fps, restante)` recibe restante = None
+    mientras no haya datos suficientes.
+    """
+
+    def __init__(self, callback: Callable[[int, str, float, Optional[float]], None],
+                 interval: float = 0.25, window: float = 2.0, clock: Callable[[], float] = time.perf_counter):
+        self.callback = callback
+        self.interval = interval
+        self.window = window
+        self.clock = clock
+        self._samples = deque()  # (instante, frames hechos)
+        self._total = 0
+        self._value = None
+        self._last_emit = None
+
+    @property
+    def fps(self) -> float:
+        if len(self._samples) < 2:
+            return 0.0
+        (t0, f0), (t1, f1) = self._samples[0], self._samples[-1]
+        return (f1 - f0) / (t1 - t0) if t1 > t0 else 0.0
+
+    @property
+    def remaining(self) -> Optional[float]:
+        """Segundos que faltan para terminar los frames, al ritmo actual"""
+        fps = self.fps
+        if fps <= 0:
+            return None
+        return (self._total - self._samples[-1][1]) / fps
+
+    def frame(self, done: int, total: int):
+        now = self.clock()
+        self._total = total
+        self._samples.append((now, done))
+        while len(self._samples) > 2 and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+    def progress(self, value: int, status: str):
+        now = self.clock()
+        changed = value != self._value
+        self._value = value
+        if changed or self._last_emit is None or now - self._last_emit >= self.interval:
+            self._last_emit = now
+            self.callback(value, status, self.fps, self.remaining)
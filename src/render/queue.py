@@ -0,0 +1,89 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterable, List, Optional
+from ..utils.file_handler import FileHandler
+from ..video.generator import VideoOutput
+from .job import RenderJob, RenderOptions, RenderResult, parse_format, run_job
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.m4a')
+
+def collect_audio_files(inputs: Iterable[str]) -> List[str]:
+    """Expande archivos, directorios (recursivamente) y patrones glob a archivos de audio"""
+    found = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                found.extend(os.path.join(root, name) for name in sorted(names))
+        elif os.path.isfile(item):
+            found.append(item)
+        else:
+            found.extend(sorted(glob.glob(item, recursive=True)))
+
+    seen = set()
+    files = []
+    for path in found:
+        path = os.path.abspath(path)
+        if path.lower().endswith(AUDIO_EXTENSIONS) and path not in seen:
+            seen.add(path)
+            files.append(path)
+    return files
+
+
+def plan_jobs(audio_paths: Iterable[str], output_base: str, options: RenderOptions) -> List[RenderJob]:
+    """Crea un trabajo por archivo con su propia ruta de salida.
+
+    Cada ruta se reserva creando un archivo vacío, para que dos pistas con
+    el mismo nombre no reciban la misma salida. Con `options.formats` se
+    reserva una salida por formato (p. ej. cancion_9x16_visual.mp4).
+    """
+    # Validar los formatos antes de reservar ninguna ruta
+    sizes = [parse_format(fmt) for fmt in options.formats]
+    jobs = []
+    for audio_path in audio_paths:
+        name = os.path.basename(audio_path)
+        if not options.formats:
+            output_path = FileHandler.get_output_path(output_base, name)
+            open(output_path, 'a').close()
+            jobs.append(RenderJob(audio_path, output_path, options))
+            continue
+
+        outputs = []
+        for fmt, (width, height) in zip(options.formats, sizes):
+            label = fmt.replace(':', 'x')
+            path = FileHandler.get_output_path(output_base, f"{os.path.splitext(name)[0]}_{label}")
+            open(path, 'a').close()
+            outputs.append(VideoOutput(path, width, height))
+        jobs.append(RenderJob(audio_path, outputs[0].path, options, outputs))
+    return jobs
+
+
+class RenderQueue:
+    """Cola de trabajos de renderizado con varios trabajos en paralelo"""
+
+    def __init__(self, workers: int = 1):
+        self.workers = max(1, workers)
+        self.jobs: List[RenderJob] = []
+
+    def add(self, job: RenderJob):
+        self.jobs.append(job)
+
+    def run(self, on_result: Optional[Callable[[RenderResult], None]] = None) -> List[RenderResult]:
+        """Ejecuta todos los trabajos; `on_result` se llama según van terminando"""
+        results = []
+        if self.workers == 1:
+            for job in self.jobs:
+                result = run_job(job)
+                results.append(result)
+                if on_result:
+                    on_result(result)
+            return results
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(run_job, job) for job in self.jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if on_result:
+                    on_result(result)
+        return results
@@ -1,42 +1,58 @@
-from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, 
-                           QPushButton, QLabel, QFileDialog, QMessageBox)
+from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+                           QPushButton, QLabel, QFileDialog, QMessageBox, QListWidget)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
-from ..audio.processor import AudioProcessor
-from ..video.generator import VideoGenerator
+from ..render.job import CancelToken, RenderCancelled, render_audio
+from ..render.progress import ProgressReporter
 from ..utils.file_handler import FileHandler
 from .progress_bar import ProgressBar
 import os
 
 class VideoGeneratorThread(QThread):
     progress_updated = pyqtSignal(int, str)
+    stats_updated = pyqtSignal(float, float)
     finished = pyqtSignal(str)
     error = pyqtSignal(str)
+    cancelled = pyqtSignal()
     
     def __init__(self, audio_path: str, output_path: str):
         super().__init__()
         self.audio_path = audio_path
         self.output_path = output_path
-        
+        self.cancel_token = CancelToken()
+    
+    def cancel(self):
+        """Pide que se detenga; el renderizado para en el siguiente frame"""
+        self.cancel_token.cancel()
+    
+    def _report(self, progress: int, status: str, fps: float, remaining):
+        self.progress_updated.emit(progress, status)
+        self.stats_updated.emit(fps, -1.0 if remaining is None else remaining)
+    
     def run(self):
+        # Un aviso por frame saturaría la cola de eventos de Qt: limitar su frecuencia
+        reporter = ProgressReporter(self._report)
         try:
-            # Procesar audio
-            self.progress_updated.emit(0, "Procesando audio...")
-            processor = AudioProcessor(self.audio_path)
-            audio_features = processor.process_audio()
-            
-            # Generar video
-            self.progress_updated.emit(20, "Iniciando generación de video...")
-            generator = VideoGenerator()
-            generator.generate_video(
-                audio_features,
+            render_audio(
+                self.audio_path,
                 self.output_path,
-                lambda progress, status: self.progress_updated.emit(20 + int(progress * 0.8), status)
+                reporter.progress,
+                cancel=self.cancel_token,
+                frame_callback=reporter.frame
             )
             
             self.finished.emit(self.output_path)
-            
+        
+        except RenderCancelled:
+            self._remove_output()
+            self.cancelled.emit()
         except Exception as e:
+            self._remove_output()
             self.error.emit(str(e))
+    
+    def _remove_output(self):
+        # No dejar vídeos a medias
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -52,10 +68,13 @@ class MainWindow(QMainWindow):
         self.upload_button = QPushButton("Subir Audio")
         self.upload_button.clicked.connect(self.upload_audio)
         
-        # Añadir label para mostrar el archivo seleccionado
+        # Añadir label para mostrar el estado de la cola
         self.file_label = QLabel("Ningún archivo seleccionado")
         self.file_label.setAlignment(Qt.AlignCenter)
         
+        # Archivos pendientes de procesar, en orden
+        self.queue_list = QListWidget()
+        
         # Añadir botón para limpiar selección
         self.clear_button = QPushButton("Limpiar selección")
         self.clear_button.clicked.connect(self.clear_selection)
@@ -65,93 +84,139 @@ class MainWindow(QMainWindow):
         self.create_video_button.clicked.connect(self.create_video)
         self.create_video_button.setEnabled(False)
         
+        self.cancel_button = QPushButton("Cancelar")
+        self.cancel_button.clicked.connect(self.cancel_video)
+        self.cancel_button.setEnabled(False)
+        
         self.progress_bar = ProgressBar()
         self.progress_bar.hide()
         
         # Agregar componentes al layout
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.create_video_button)
+        buttons.addWidget(self.cancel_button)
         layout.addWidget(self.upload_button)
         layout.addWidget(self.file_label)
+        layout.addWidget(self.queue_list)
         layout.addWidget(self.clear_button)
-        layout.addWidget(self.create_video_button)
+        layout.addLayout(buttons)
         layout.addWidget(self.progress_bar)
         
-        self.audio_path = None
+        self.pending = []           # audios en cola
+        self.results = []           # (audio, salida o None, error) de la tanda actual
         self.generator_thread = None
     
+    @property
+    def busy(self) -> bool:
+        return self.generator_thread is not None
+    
+    def _refresh_queue(self):
+        self.queue_list.clear()
+        if self.busy:
+            self.queue_list.addItem(f"▶ {os.path.basename(self.generator_thread.audio_path)}")
+        self.queue_list.addItems([os.path.basename(path) for path in self.pending])
+        
+        if self.pending:
+            self.file_label.setText(f"{len(self.pending)} archivo(s) en cola")
+        elif not self.busy:
+            self.file_label.setText("Ningún archivo seleccionado")
+        self.create_video_button.setEnabled(bool(self.pending) and not self.busy)
+        self.clear_button.setEnabled(bool(self.pending))
+        self.cancel_button.setEnabled(self.busy)
+    
     def clear_selection(self):
-        self.audio_path = None
-        self.file_label.setText("Ningún archivo seleccionado")
-        self.create_video_button.setEnabled(False)
-        self.clear_button.setEnabled(False)
+        # Solo se quitan los pendientes; el que se está renderizando sigue
+        self.pending = []
+        self._refresh_queue()
     
     def upload_audio(self):
-        if self.audio_path:  # Si ya hay un archivo seleccionado
-            reply = QMessageBox.question(
-                self,
-                "Archivo existente",
-                "Ya hay un archivo seleccionado. ¿Desea reemplazarlo?",
-                QMessageBox.Yes | QMessageBox.No,
-                QMessageBox.No
-            )
-            if reply == QMessageBox.No:
-                return
-        
-        file_path, _ = QFileDialog.getOpenFileName(
+        file_paths, _ = QFileDialog.getOpenFileNames(
             self,
-            "Seleccionar archivo de audio",
+            "Seleccionar archivos de audio",
             "",
             "Audio Files (*.mp3 *.wav *.ogg *.m4a)"
         )
         
-        if file_path:
-            self.audio_path = file_path
-            self.file_label.setText(f"Archivo seleccionado: {os.path.basename(file_path)}")
-            self.create_video_button.setEnabled(True)
-            self.clear_button.setEnabled(True)
+        new_paths = [path for path in file_paths if path not in self.pending]
+        if new_paths:
+            self.pending.extend(new_paths)
+            self._refresh_queue()
     
     def create_video(self):
-        if not self.audio_path:
+        if not self.pending or self.busy:
             return
-            
-        # Deshabilitar botones durante el procesamiento
-        self.upload_button.setEnabled(False)
-        self.create_video_button.setEnabled(False)
+        
+        self.results = []
         self.progress_bar.show()
+        self._start_next()
+    
+    def _start_next(self):
+        """Lanza el siguiente audio de la cola o, si no quedan, muestra el resumen"""
+        if not self.pending:
+            self.progress_bar.hide()
+            self._refresh_queue()
+            self._show_summary()
+            return
+        
+        audio_path = self.pending.pop(0)
         
         # Preparar ruta de salida
         output_path = FileHandler.get_output_path(
             os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
-            os.path.basename(self.audio_path)
+            os.path.basename(audio_path)
         )
         
         # Iniciar procesamiento en thread separado
-        self.generator_thread = VideoGeneratorThread(self.audio_path, output_path)
+        self.progress_bar.reset()
+        self.generator_thread = VideoGeneratorThread(audio_path, output_path)
         self.generator_thread.progress_updated.connect(self.update_progress)
+        self.generator_thread.stats_updated.connect(self.progress_bar.update_stats)
         self.generator_thread.finished.connect(self.process_completed)
         self.generator_thread.error.connect(self.process_error)
+        self.generator_thread.cancelled.connect(self.process_cancelled)
         self.generator_thread.start()
+        self._refresh_queue()
+    
+    def _job_done(self, output_path, error):
+        """Registra el resultado del trabajo actual (sin salida ni error = cancelado)"""
+        thread = self.generator_thread
+        thread.wait()
+        self.generator_thread = None
+        self.results.append((thread.audio_path, output_path, error))
+    
+    def cancel_video(self):
+        if self.busy:
+            self.cancel_button.setEnabled(False)
+            self.progress_bar.update_progress(self.progress_bar.progress.value(), "Cancelando...")
+            self.generator_thread.cancel()
     
     def update_progress(self, value: int, status: str):
         self.progress_bar.update_progress(value, status)
     
     def process_completed(self, output_path: str):
-        self.upload_button.setEnabled(True)
-        self.create_video_button.setEnabled(True)
-        self.progress_bar.hide()
-        
-        QMessageBox.information(
-            self,
-            "Proceso Completado",
-            f"Video generado exitosamente en:\n{output_path}"
-        )
+        self._job_done(output_path, None)
+        self._start_next()
     
     def process_error(self, error_message: str):
-        self.upload_button.setEnabled(True)
-        self.create_video_button.setEnabled(True)
+        self._job_done(None, error_message)
+        self._start_next()
+    
+    def process_cancelled(self):
+        # Cancelar detiene la tanda: los pendientes se quedan en la cola
+        self._job_done(None, None)
         self.progress_bar.hide()
+        self._refresh_queue()
+        self._show_summary()
+    
+    def _show_summary(self):
+        done = [(audio, output) for audio, output, error in self.results if output]
+        failed = [(audio, error) for audio, output, error in self.results if error]
+        if not done and not failed:
+            return
         
-        QMessageBox.critical(
-            self,
-            "Error",
-            f"Error durante el procesamiento:\n{error_message}"
-        )
\ No newline at end of file
+        lines = [f"Video generado exitosamente en:\n{output}" for _, output in done]
+        lines += [f"Error con {os.path.basename(audio)}:\n{error}" for audio, error in failed]
+        if failed:
+            QMessageBox.critical(self, "Error", "\n\n".join(lines))
+        else:
+            QMessageBox.information(self, "Proceso Completado", "\n\n".join(lines))
@@ -11,9 +11,29 @@ class ProgressBar(QWidget):
         self.progress.setMinimum(0)
         self.progress.setMaximum(100)
         
+        # Velocidad de renderizado y tiempo restante
+        self.stats_label = QLabel("")
+        
         layout.addWidget(self.status_label)
         layout.addWidget(self.progress)
+        layout.addWidget(self.stats_label)
+    
+    def reset(self, status="Preparando..."):
+        self.progress.setValue(0)
+        self.status_label.setText(status)
+        self.stats_label.setText("")
     
     def update_progress(self, value, status):
         self.progress.setValue(value)
-        self.status_label.setText(status) 
\ No newline at end of file
+        self.status_label.setText(status)
+    
+    def update_stats(self, fps, remaining):
+        """Muestra los fps y el tiempo restante (remaining < 0 = desconocido)"""
+        if fps <= 0:
+            self.stats_label.setText("")
+            return
+        text = f"{fps:.1f} fps"
+        if remaining >= 0:
+            minutes, seconds = divmod(int(remaining), 60)
+            text += f"  ·  quedan {minutes:02d}:{seconds:02d}"
+        self.stats_label.setText(text)
@@ -0,0 +1,111 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from dataclasses import asdict
+from typing import Dict, List, Optional
+from .compositor import FrameCompositor
+from .control import ControlTrack
+from .lod import LODSettings
+from .particles import ParticleSystem
+
+def render_signature(track: ControlTrack, width: int, height: int, seed: Optional[int],
+                     lod: Optional[LODSettings] = None, target_fps: Optional[float] = None,
+                     rasterizer: str = 'opencv', encoder_options: Optional[Dict] = None) -> str:
+    """Identifica un renderizado: mismos controles y ajustes dan el mismo estado y los mismos segmentos.
+
+    El nivel de detalle cambia la simulación (descarta partículas y estelas),
+    y el rasterizador y las opciones del codificador cambian los segmentos.
+    """
+    h = hashlib.blake2b(digest_size=10)
+    h.update(np.ascontiguousarray(track.data).tobytes())
+    h.update(f"{width}x{height}@{track.fps}:{seed}".encode())
+    settings = {
+        'lod': asdict(lod) if lod is not None else None,
+        'target_fps': target_fps,
+        'rasterizer': rasterizer,
+        'encoder': encoder_options or {},
+    }
+    h.update(json.dumps(settings, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+class CheckpointStore:
+    """Checkpoints periódicos del estado de la simulación en disco.
+
+    Cada checkpoint es un .npz comprimido con las partículas, las estelas,
+    el estado del generador aleatorio y, si se guardó durante el dibujado,
+    el frame anterior del compositor. Se indexan por la firma de la
+    simulación y el número de frame en el que continúa. Los segmentos de
+    vídeo ya codificados de un renderizado con checkpoints también viven
+    aquí, para poder reanudarlo.
+    """
+
+    def __init__(self, directory: str, interval: int):
+        self.directory = directory
+        self.interval = max(1, interval)
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, signature: str, frame: int) -> str:
+        return os.path.join(self.directory, f"{signature}_{frame:08d}.npz")
+
+    def save(self, signature: str, frame: int, system: ParticleSystem,
+             compositor: Optional[FrameCompositor] = None):
+        """Guarda el estado con el que empieza el frame `frame`"""
+        state = system.get_state()
+        if compositor is not None:
+            state.update({f'c_{key}': value for key, value in compositor.get_state().items()})
+        # Escritura atómica: un checkpoint a medias nunca se confunde con uno válido
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, **state)
+            os.replace(tmp_path, self._path(signature, frame))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def frames(self, signature: str, with_compositor: bool = False) -> List[int]:
+        """Frames con checkpoint para esta simulación, en orden"""
+        found = []
+        for path in glob.glob(os.path.join(self.directory, f"{signature}_*.npz")):
+            frame = int(os.path.splitext(os.path.basename(path))[0].rsplit('_', 1)[1])
+            if with_compositor:
+                with np.load(path, allow_pickle=False) as data:
+                    if 'c_prev' not in data.files:
+                        continue
+            found.append(frame)
+        return sorted(found)
+
+    def latest(self, signature: str, at_most: int) -> Optional[int]:
+        """Último checkpoint no posterior al frame `at_most`"""
+        frames = [f for f in self.frames(signature) if f <= at_most]
+        return frames[-1] if frames else None
+
+    def restore(self, signature: str, frame: int, system: ParticleSystem,
+                compositor: Optional[FrameCompositor] = None) -> bool:
+        """Carga un checkpoint; devuelve True si incluía el estado del compositor"""
+        with np.load(self._path(signature, frame), allow_pickle=False) as data:
+            system.set_state(data)
+            if compositor is None or 'c_prev' not in data.files:
+                return False
+            compositor.set_state({key[2:]: data[key] for key in data.files if key.startswith('c_')})
+            return True
+
+    def segment_dir(self, signature: str, start: int, end: int) -> str:
+        """Directorio de los segmentos de vídeo del renderizado de [start, end)"""
+        path = os.path.join(self.directory, f"{signature}_segments_{start}_{end}")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @staticmethod
+    def segment_path(segment_dir: str, start: int) -> str:
+        return os.path.join(segment_dir, f"{start:08d}.mp4")
+
+    @staticmethod
+    def clear_segments(segment_dir: str):
+        shutil.rmtree(segment_dir, ignore_errors=True)
@@ -0,0 +1,275 @@
+import cv2
+import numpy as np
+from typing import Iterator, Optional, Tuple
+from .instrument import NULL_INSTRUMENTATION
+
+class DirtyTiles:
+    """Rejilla de tiles marcados como tocados durante el dibujado de un frame"""
+
+    def __init__(self, width: int, height: int, tile_size: int = 64):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.grid = np.zeros((-(-height // tile_size), -(-width // tile_size)), dtype=bool)
+
+    def clear(self):
+        self.grid.fill(False)
+
+    def mark(self, x0: int, y0: int, x1: int, y1: int):
+        """Marca los tiles que cortan el rectángulo [x0, x1) x [y0, y1)"""
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.width, x1), min(self.height, y1)
+        if x0 < x1 and y0 < y1:
+            t = self.tile_size
+            self.grid[y0 // t:(y1 - 1) // t + 1, x0 // t:(x1 - 1) // t + 1] = True
+
+    def mark_boxes(self, x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray):
+        """Versión vectorizada de `mark` para muchos rectángulos a la vez"""
+        x0, y0 = np.maximum(x0, 0), np.maximum(y0, 0)
+        x1, y1 = np.minimum(x1, self.width), np.minimum(y1, self.height)
+        valid = (x0 < x1) & (y0 < y1)
+        if not valid.any():
+            return
+        t = self.tile_size
+        tx0, ty0 = x0[valid] // t, y0[valid] // t
+        tx1, ty1 = (x1[valid] - 1) // t, (y1[valid] - 1) // t
+        for dy in range(int((ty1 - ty0).max()) + 1):
+            for dx in range(int((tx1 - tx0).max()) + 1):
+                inside = (ty0 + dy <= ty1) & (tx0 + dx <= tx1)
+                self.grid[ty0[inside] + dy, tx0[inside] + dx] = True
+
+
+def tile_regions(mask: np.ndarray, tile_size: int) -> Iterator[Tuple[slice, slice]]:
+    """Rachas horizontales de tiles activos en `mask`, como slices sobre los buffers"""
+    t = tile_size
+    for row in np.flatnonzero(mask.any(axis=1)):
+        cols = np.flatnonzero(mask[row])
+        breaks = np.flatnonzero(np.diff(cols) > 1)
+        starts = np.concatenate([[cols[0]], cols[breaks + 1]])
+        ends = np.concatenate([cols[breaks], [cols[-1]]]) + 1
+        for start, end in zip(starts, ends):
+            yield slice(row * t, (row + 1) * t), slice(start * t, end * t)
+
+
+class TileCanvas:
+    """Lienzo con alto y ancho redondeados a tiles completos.
+
+    Recuerda qué tiles se dibujaron para limpiar solo esos antes del
+    siguiente frame. El compositor tiene uno propio; un pipeline puede usar
+    varios para dibujar un frame mientras se mezcla el anterior.
+    """
+
+    def __init__(self, width: int, height: int, tile_size: int = 64, background: Optional[np.ndarray] = None):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.background = background
+        self.dirty = DirtyTiles(width, height, tile_size)
+        rows, cols = self.dirty.grid.shape
+        self.buffer = np.zeros((rows * tile_size, cols * tile_size, 3), dtype=np.uint8)
+        # Tiles que pueden tener contenido distinto de cero
+        self.live = np.zeros((rows, cols), dtype=bool)
+
+    @property
+    def frame(self) -> np.ndarray:
+        return self.buffer[:self.height, :self.width]
+
+    def clear(self) -> np.ndarray:
+        """Deja el lienzo limpio y devuelve el frame para dibujar"""
+        frame = self.frame
+        if self.background is not None:
+            np.copyto(frame, self.background)
+        else:
+            # Solo hace falta limpiar lo que se dibujó en el frame anterior
+            for region in tile_regions(self.live, self.tile_size):
+                self.buffer[region] = 0
+            self.live.fill(False)
+        self.dirty.clear()
+        return frame
+
+
+class FrameCompositor:
+    """Mezcla con el frame anterior y suavizado sin reservar memoria por frame.
+
+    Es dueño de un pequeño conjunto de buffers del tamaño del frame que se
+    reutilizan e intercambian entre frames: el lienzo donde se dibujan las
+    partículas, el frame mezclado actual y el anterior, y la salida
+    suavizada. Tras el primer frame no se crean arrays nuevos.
+
+    Con fondo negro solo se procesan los tiles activos: los que se han
+    dibujado en este frame y los que aún conservan rastro del anterior por
+    encima de `threshold`. Con `threshold=0` el resultado es idéntico al de
+    procesar el frame completo.
+    """
+
+    def __init__(self, width: int, height: int, background: Optional[np.ndarray] = None,
+                 tile_size: int = 64, threshold: int = 0):
+        self.width = width
+        self.height = height
+        self.background = background
+        self.tile_size = tile_size
+        self.threshold = threshold
+        self._main = TileCanvas(width, height, tile_size, background)
+        self.dirty = self._main.dirty
+        rows, cols = self.dirty.grid.shape
+
+        # Buffers con alto y ancho redondeados a tiles completos
+        padded = (rows * tile_size, cols * tile_size, 3)
+        self._canvas = self._main.buffer
+        self._blended = np.zeros(padded, dtype=np.uint8)
+        self._prev = np.zeros(padded, dtype=np.uint8)
+        self._scratch = np.zeros(padded, dtype=np.uint8)
+        self._output = np.zeros((height, width, 3), dtype=np.uint8)
+
+        # Tiles que pueden tener contenido distinto de cero en cada buffer
+        self._blended_live = np.zeros((rows, cols), dtype=bool)
+        self._prev_live = np.zeros((rows, cols), dtype=bool)
+        self._output_live = np.zeros((rows, cols), dtype=bool)
+        self._has_prev = False
+        self.instrumentation = NULL_INSTRUMENTATION  # Tiempos de blend/blur (opcional)
+
+    @property
+    def tiled(self) -> bool:
+        return self.background is None
+
+    def reset(self):
+        """Olvida el frame anterior (p. ej. al empezar otro vídeo)"""
+        self._has_prev = False
+
+    def get_state(self) -> dict:
+        """Lo que la mezcla necesita del pasado: el frame anterior y sus tiles con contenido"""
+        return {
+            'prev': self._prev[:self.height, :self.width].copy(),
+            'prev_live': self._prev_live.copy(),
+            'has_prev': np.array(self._has_prev),
+        }
+
+    def set_state(self, state):
+        """Restaura un estado de `get_state`; el resto de buffers quedan limpios"""
+        for buffer in (self._canvas, self._blended, self._prev, self._output):
+            buffer.fill(0)
+        for live in (self._main.live, self._blended_live, self._output_live):
+            live.fill(False)
+        self._prev[:self.height, :self.width] = state['prev']
+        self._prev_live[...] = state['prev_live']
+        self._has_prev = bool(state['has_prev'])
+
+    def canvas(self) -> np.ndarray:
+        """Lienzo limpio para dibujar el siguiente frame"""
+        return self._main.clear()
+
+    def new_canvas(self) -> TileCanvas:
+        """Lienzo adicional compatible con este compositor (ver `compose_canvas`)"""
+        return TileCanvas(self.width, self.height, self.tile_size, self.background)
+
+    def _regions(self, mask: np.ndarray) -> Iterator[Tuple[slice, slice]]:
+        return tile_regions(mask, self.tile_size)
+
+    def _content_tiles(self, frame: np.ndarray) -> np.ndarray:
+        """Tiles con algún píxel distinto de cero (para frames dibujados fuera)"""
+        t = self.tile_size
+        grid = np.zeros_like(self.dirty.grid)
+        starts = np.arange(0, self.width, t)
+        for row in range(grid.shape[0]):
+            band = frame[row * t:(row + 1) * t]
+            # Máximo por columna (reducción sobre filas contiguas, la más rápida)
+            column_max = band.reshape(len(band), -1).max(axis=0).reshape(self.width, 3).max(axis=1)
+            grid[row] = np.maximum.reduceat(column_max, starts) > 0
+        return grid
+
+    def compose(self, frame: np.ndarray, blend_factor: float, dirty: Optional[np.ndarray] = None) -> np.ndarray:
+        """Mezcla `frame` con el anterior y lo suaviza.
+
+        `dirty` indica los tiles dibujados; si no se da y `frame` es el
+        lienzo del compositor se usan los tiles marcados al dibujar, y si
+        es otro frame se deducen de su contenido. Devuelve un buffer interno
+        que solo es válido hasta la siguiente llamada.
+        """
+        if not self.tiled:
+            return self._compose_full(frame, blend_factor)
+
+        if frame.base is not self._canvas:
+            # Frame dibujado fuera (p. ej. en otro proceso): copiarlo al lienzo
+            drawn = self._content_tiles(frame) if dirty is None else dirty
+            np.copyto(self._main.frame, frame)
+            self._main.live.fill(True)
+            return self._compose_tiles(self._main, blend_factor, drawn)
+        return self._compose_tiles(self._main, blend_factor, self.dirty.grid if dirty is None else dirty)
+
+    def compose_canvas(self, canvas: TileCanvas, blend_factor: float) -> np.ndarray:
+        """Como `compose`, para un frame dibujado en un lienzo de `new_canvas`"""
+        if not self.tiled:
+            return self._compose_full(canvas.frame, blend_factor)
+        return self._compose_tiles(canvas, blend_factor, canvas.dirty.grid)
+
+    def _compose_tiles(self, canvas: TileCanvas, blend_factor: float, drawn: np.ndarray) -> np.ndarray:
+        canvas.live |= drawn
+        with self.instrumentation.stage('blend'):
+            blended_live = self._blend(canvas.buffer, blend_factor, drawn)
+        with self.instrumentation.stage('blur'):
+            return self._blur(blended_live)
+
+    def _blend(self, source: np.ndarray, blend_factor: float, drawn: np.ndarray) -> np.ndarray:
+        """Mezcla los tiles activos de `source` con el frame anterior; devuelve los tiles que quedan con contenido"""
+        active = drawn | self._prev_live if self._has_prev else drawn.copy()
+        t = self.tile_size
+        blended_live = np.zeros_like(active)
+        for rows, cols in self._regions(active):
+            dst = self._blended[rows, cols]
+            if self._has_prev:
+                cv2.addWeighted(source[rows, cols], blend_factor,
+                                self._prev[rows, cols], 1 - blend_factor, 0, dst=dst)
+            else:
+                np.copyto(dst, source[rows, cols])
+            # Tiles que siguen teniendo rastro tras la mezcla
+            tile_max = dst.reshape(t, -1).max(axis=0).reshape(-1, t * 3).max(axis=1)
+            faded = tile_max <= self.threshold
+            if self.threshold > 0 and faded.any():
+                dst.reshape(t, -1, t, 3)[:, faded] = 0
+            blended_live[rows.start // t, cols.start // t:cols.stop // t] = ~faded
+
+        # Limpiar lo que quedaba en el buffer de mezcla de hace dos frames
+        for rows, cols in self._regions(self._blended_live & ~active):
+            self._blended[rows, cols] = 0
+        self._has_prev = True
+
+        # El frame mezclado pasa a ser el anterior del siguiente frame
+        self._blended, self._prev = self._prev, self._blended
+        self._blended_live, self._prev_live = self._prev_live, blended_live
+        return blended_live
+
+    def _blur(self, blended_live: np.ndarray) -> np.ndarray:
+        """Suaviza el frame mezclado solo alrededor de los tiles con contenido"""
+        # El desenfoque 3x3 alcanza un píxel más allá de los tiles con contenido
+        blurred = cv2.dilate(blended_live.view(np.uint8), np.ones((3, 3), np.uint8)).astype(bool)
+        prev = self._prev[:self.height, :self.width]
+        for rows, cols in self._regions(blurred):
+            y0, y1 = rows.start, min(rows.stop, self.height)
+            x0, x1 = cols.start, min(cols.stop, self.width)
+            # Región con un píxel de margen para que los bordes usen a sus vecinos
+            ry0, ry1 = max(0, y0 - 1), min(self.height, y1 + 1)
+            rx0, rx1 = max(0, x0 - 1), min(self.width, x1 + 1)
+            cv2.GaussianBlur(prev[ry0:ry1, rx0:rx1], (3, 3), 0, dst=self._scratch[ry0:ry1, rx0:rx1])
+            self._output[y0:y1, x0:x1] = self._scratch[y0:y1, x0:x1]
+        for rows, cols in self._regions(self._output_live & ~blurred):
+            self._output[rows.start:rows.stop, cols.start:cols.stop] = 0
+        self._output_live = blurred
+        return self._output
+
+    def _compose_full(self, frame: np.ndarray, blend_factor: float) -> np.ndarray:
+        blended = self._blended[:self.height, :self.width]
+        prev = self._prev[:self.height, :self.width]
+        with self.instrumentation.stage('blend'):
+            if self._has_prev:
+                cv2.addWeighted(frame, blend_factor, prev, 1 - blend_factor, 0, dst=blended)
+            else:
+                np.copyto(blended, frame)
+                self._has_prev = True
+
+        # El frame mezclado pasa a ser el anterior del siguiente frame
+        self._blended, self._prev = self._prev, self._blended
+
+        # Aplicar un poco de desenfoque para suavizar
+        with self.instrumentation.stage('blur'):
+            cv2.GaussianBlur(blended, (3, 3), 0, dst=self._output)
+        return self._output
@@ -0,0 +1,90 @@
+import numpy as np
+from typing import Mapping
+
+# Parámetros por frame que consume el bucle de renderizado
+CONTROL_DTYPE = np.dtype([
+    ('intensity', np.float64),
+    ('frequency', np.float64),
+    ('energy', np.float64),
+    ('note_duration', np.float64),
+    ('particle_count', np.int32),
+    ('blend_factor', np.float64),
+    ('beat', np.bool_),
+])
+
+ANALYSIS_HOP_LENGTH = 512  # Hop de los frames de análisis de audio
+
+def normalize(values: np.ndarray) -> np.ndarray:
+    return (values - values.min()) / (values.max() - values.min() + 1e-6)
+
+def estimate_note_durations(rms: np.ndarray, fps: int, window_size: int = 10) -> np.ndarray:
+    """Duración estimada (en segundos) de la nota en cada frame.
+
+    Para cada frame cuenta cuántos frames consecutivos, a partir de él y
+    dentro de la ventana, mantienen al menos el 70% de su energía.
+    """
+    # Ventanas hacia adelante; lo que queda fuera del audio nunca supera el umbral
+    padded = np.concatenate([rms, np.full(window_size - 1, -np.inf)])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window_size)
+    above = windows >= (rms * 0.7)[:, None]
+    # Longitud de la racha inicial de valores por encima del umbral
+    run_length = np.cumprod(above, axis=1).sum(axis=1)
+    return run_length / fps
+
+
+class ControlTrack:
+    """Pista de control: parámetros precalculados para cada frame de vídeo"""
+
+    def __init__(self, data: np.ndarray, fps: int):
+        self.data = data
+        self.fps = fps
+
+    @classmethod
+    def from_features(cls, audio_features: Mapping, fps: int, beats: bool = False) -> 'ControlTrack':
+        """Construye la pista a partir de las características de audio.
+
+        Con `beats=True` se marcan los frames con beat (esto calcula el
+        seguimiento de beats si aún no se había hecho).
+        """
+        duration = audio_features['duration']
+        total_frames = int(duration * fps)
+
+        # Interpolar características
+        frames_times = np.linspace(0, duration, total_frames)
+        audio_times = np.linspace(0, duration, len(audio_features['rms']))
+
+        rms = np.interp(frames_times, audio_times, audio_features['rms'])
+        spec_centroids = np.interp(frames_times, audio_times, audio_features['spectral_centroids'])
+        spec_rolloff = np.interp(frames_times, audio_times, audio_features['spectral_rolloff'])
+
+        data = np.zeros(total_frames, dtype=CONTROL_DTYPE)
+        data['intensity'] = normalize(rms)
+        data['frequency'] = normalize(spec_centroids)
+        data['energy'] = normalize(spec_rolloff)
+        data['note_duration'] = estimate_note_durations(data['intensity'], fps)
+
+        # Más energía e intensidad = más partículas
+        data['particle_count'] = (10 + data['energy'] * 30 + data['intensity'] * 20).astype(np.int32)
+        # Más energía = menos rastro del frame anterior
+        data['blend_factor'] = 0.85 - (data['energy'] * 0.3)
+
+        if beats:
+            beat_times = np.asarray(audio_features['beat_frames']) * ANALYSIS_HOP_LENGTH / audio_features['sample_rate']
+            beat_idx = np.round(beat_times * fps).astype(np.int64)
+            data['beat'][beat_idx[(beat_idx >= 0) & (beat_idx < total_frames)]] = True
+
+        return cls(data, fps)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, frame_num):
+        return self.data[frame_num]
+
+    def save(self, path: str):
+        np.savez_compressed(path, track=self.data, fps=self.fps)
+
+    @classmethod
+    def load(cls, path: str) -> 'ControlTrack':
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['track'], int(data['fps']))
@@ -0,0 +1,334 @@
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import cv2
+import numpy as np
+from typing import List, Optional
+from ..audio.pcm import PCMAudio
+
+def find_ffmpeg() -> Optional[str]:
+    """Busca el ejecutable de ffmpeg (el de imageio-ffmpeg o el del sistema)"""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return shutil.which('ffmpeg')
+
+
+def audio_input_args(audio_path: Optional[str], audio_pcm: Optional[PCMAudio] = None,
+                     audio_start: float = 0.0) -> List[str]:
+    """Argumentos de ffmpeg para la entrada de audio (vacíos si no hay audio).
+
+    Con `audio_pcm` ffmpeg lee el PCM ya decodificado de la caché en lugar
+    de volver a decodificar el archivo original.
+    """
+    if audio_pcm is not None:
+        args = ['-f', 'f32le', '-ar', str(audio_pcm.sample_rate), '-ac', str(audio_pcm.channels),
+                '-skip_initial_bytes', str(audio_pcm.offset)]
+        source = audio_pcm.path
+    elif audio_path:
+        args, source = [], audio_path
+    else:
+        return []
+    if audio_start > 0:
+        args += ['-ss', f'{audio_start:.6f}']
+    return args + ['-i', source]
+
+
+class FFmpegPipeEncoder:
+    """Envía los frames BGR crudos por stdin a un único proceso de ffmpeg.
+
+    ffmpeg codifica el vídeo a H.264 y mezcla el audio original en AAC en
+    una sola pasada, sin archivo temporal ni segunda codificación.
+    """
+
+    def __init__(self, output_path: str, width: int, height: int, fps: int,
+                 audio_path: Optional[str] = None, preset: str = 'medium',
+                 crf: int = 23, threads: int = 0, ffmpeg_binary: Optional[str] = None,
+                 audio_start: float = 0.0, audio_pcm: Optional[PCMAudio] = None):
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.audio_path = audio_path
+        self.audio_start = audio_start  # segundo del audio con el que empieza el vídeo
+        self.audio_pcm = audio_pcm      # el mismo audio ya decodificado (opcional)
+        self.preset = preset
+        self.crf = crf
+        self.threads = threads
+        self.ffmpeg_binary = ffmpeg_binary or find_ffmpeg()
+        self._process = None
+        self._stderr = None
+
+    def _command(self):
+        cmd = [
+            self.ffmpeg_binary, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+            '-s', f'{self.width}x{self.height}', '-r', str(self.fps),
+            '-i', '-',
+        ]
+        audio_input = audio_input_args(self.audio_path, self.audio_pcm, self.audio_start)
+        if audio_input:
+            cmd += audio_input + ['-map', '0:v:0', '-map', '1:a:0?', '-c:a', 'aac', '-shortest']
+        cmd += [
+            '-c:v', 'libx264', '-preset', self.preset, '-crf', str(self.crf),
+            '-pix_fmt', 'yuv420p', '-threads', str(self.threads),
+            self.output_path,
+        ]
+        return cmd
+
+    def open(self):
+        if not self.ffmpeg_binary:
+            raise RuntimeError("No se encontró ffmpeg")
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            self._command(), stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL, stderr=self._stderr
+        )
+        return self
+
+    def write(self, frame: np.ndarray):
+        try:
+            self._process.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            self._process.wait()
+            raise RuntimeError(f"ffmpeg terminó inesperadamente: {self._error_output()}")
+
+    def close(self):
+        if self._process is None:
+            return
+        self._process.stdin.close()
+        returncode = self._process.wait()
+        error = self._error_output()
+        self._stderr.close()
+        self._process = None
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg falló con código {returncode}: {error}")
+
+    def abort(self):
+        """Detiene ffmpeg y elimina la salida parcial"""
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._stderr.close()
+            self._process = None
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+    def _error_output(self) -> str:
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors='replace').strip()[-2000:]
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class OpenCVMoviePyEncoder:
+    """Ruta anterior: archivo temporal mp4v con OpenCV y mezcla de audio con MoviePy"""
+
+    def __init__(self, output_path: str, width: int, height: int, fps: int,
+                 audio_path: Optional[str] = None, preset: str = 'medium',
+                 crf: int = 23, threads: int = 0, audio_start: float = 0.0,
+                 audio_pcm: Optional[PCMAudio] = None):
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.audio_path = audio_path
+        self.audio_start = audio_start
+        self.audio_pcm = audio_pcm
+        self.preset = preset
+        self.crf = crf
+        self.threads = threads
+        self.temp_video_path = output_path + "_temp.mp4"
+        self._writer = None
+
+    def open(self):
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        self._writer = cv2.VideoWriter(self.temp_video_path, fourcc, self.fps, (self.width, self.height))
+        return self
+
+    def write(self, frame: np.ndarray):
+        self._writer.write(frame)
+
+    def close(self):
+        self._writer.release()
+        # MoviePy solo se necesita en esta ruta
+        from moviepy.editor import VideoFileClip, AudioFileClip
+        from moviepy.audio.AudioClip import AudioArrayClip
+        try:
+            video = VideoFileClip(self.temp_video_path)
+            audio = None
+            if self.audio_pcm is not None:
+                audio = AudioArrayClip(self.audio_pcm.array(), fps=self.audio_pcm.sample_rate)
+            elif self.audio_path:
+                audio = AudioFileClip(self.audio_path)
+            if audio is not None:
+                if self.audio_start > 0:
+                    audio = audio.subclip(self.audio_start)
+                video = video.set_audio(audio)
+            video.write_videofile(
+                self.output_path,
+                codec='libx264',
+                audio_codec='aac',
+                preset=self.preset,
+                threads=self.threads or None,
+                ffmpeg_params=['-crf', str(self.crf)],
+                temp_audiofile=self.output_path + "_temp_audio.m4a",
+                remove_temp=True
+            )
+
+            # Limpiar
+            video.close()
+            if self.audio_path:
+                audio.close()
+            if os.path.exists(self.temp_video_path):
+                os.remove(self.temp_video_path)
+
+        except Exception as e:
+            raise Exception(f"Error al combinar audio y video: {str(e)}")
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.release()
+        for path in (self.temp_video_path, self.output_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class BackgroundEncoder:
+    """Envuelve un codificador para que escriba los frames desde su propio hilo.
+
+    `write` copia el frame en uno de `queue_size` buffers reutilizados y
+    vuelve enseguida; el hilo los pasa al codificador (la escritura en la
+    tubería de ffmpeg libera el GIL). Si no quedan buffers libres `write`
+    espera, así que la memoria queda acotada. Los errores del hilo se
+    relanzan en la siguiente llamada a `write` o en `close`.
+    """
+
+    def __init__(self, encoder, queue_size: int = 4):
+        self.encoder = encoder
+        self.queue_size = max(1, queue_size)
+        self._free = queue.Queue()
+        self._pending = queue.Queue()
+        self._buffers = 0
+        self._thread = None
+        self._error = None
+
+    def open(self):
+        self.encoder.open()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            frame = self._pending.get()
+            if frame is None:
+                return
+            try:
+                if self._error is None:
+                    self.encoder.write(frame)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._free.put(frame)
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def write(self, frame: np.ndarray):
+        self._raise_error()
+        if self._free.empty() and self._buffers < self.queue_size:
+            buffer = np.empty_like(frame)
+            self._buffers += 1
+        else:
+            buffer = self._free.get()
+        np.copyto(buffer, frame)
+        self._pending.put(buffer)
+
+    def _join(self):
+        if self._thread is not None:
+            self._pending.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self._join()
+        if self._error is not None:
+            self.encoder.abort()
+            raise self._error
+        self.encoder.close()
+
+    def abort(self):
+        self._error = self._error or RuntimeError("Codificación cancelada")
+        self._join()
+        self.encoder.abort()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+ENCODERS = {
+    'ffmpeg': FFmpegPipeEncoder,
+    'opencv': OpenCVMoviePyEncoder,
+}
+
+def create_encoder(name: str, output_path: str, width: int, height: int, fps: int,
+                   audio_path: Optional[str] = None, **options):
+    """Crea el codificador pedido; si ffmpeg no está disponible usa la ruta anterior"""
+    if name == 'ffmpeg' and not find_ffmpeg():
+        name = 'opencv'
+    if name not in ENCODERS:
+        raise ValueError(f"Codificador desconocido: {name}")
+    return ENCODERS[name](output_path, width, height, fps, audio_path, **options)
+
+
+def concat_segments(segment_paths: List[str], output_path: str, fps: int,
+                    audio_path: Optional[str] = None, audio_start: float = 0.0,
+                    audio_pcm: Optional[PCMAudio] = None):
+    """Une segmentos de vídeo ya codificados (sin recodificar) y añade el audio"""
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError("No se encontró ffmpeg")
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as listing:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            listing.write(f"file '{escaped}'\n")
+    cmd = [ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+           '-r', str(fps), '-i', listing.name]
+    audio_input = audio_input_args(audio_path, audio_pcm, audio_start)
+    if audio_input:
+        cmd += audio_input + ['-map', '0:v:0', '-map', '1:a:0?', '-c:a', 'aac', '-shortest']
+    cmd += ['-c:v', 'copy', output_path]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    finally:
+        os.remove(listing.name)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg falló al unir los segmentos: {result.stderr.decode(errors='replace')[-2000:]}")
@@ -1,134 +1,348 @@
-import cv2
-import numpy as np
-from ..audio.processor import AudioProcessor
-from .particles import ParticleSystem
-from typing import Callable
-from moviepy.editor import VideoFileClip, AudioFileClip, CompositeVideoClip
 import os
+import time
+from ..audio.pcm import PCMAudio, PCMCache
+from .particles import ParticleSystem
+from .encoder import BackgroundEncoder, FFmpegPipeEncoder, concat_segments, create_encoder, find_ffmpeg
+from .checkpoint import CheckpointStore, render_signature
+from .parallel import ParallelRenderer
+from .control import ControlTrack
+from .compositor import FrameCompositor
+from .instrument import Instrumentation, NULL_INSTRUMENTATION, StageRecorder
+from .lod import LODSettings, QualityGovernor
+from .pipeline import CompositeStage
+from collections import deque
+from contextlib import ExitStack
+from typing import Callable, List, NamedTuple, Optional
+
+# Formatos de salida habituales: nombre -> (ancho, alto)
+OUTPUT_FORMATS = {
+    '1080p': (1920, 1080),
+    '720p': (1280, 720),
+    '480p': (854, 480),
+    '9:16': (1080, 1920),
+    '1:1': (1080, 1080),
+}
+
+class VideoOutput(NamedTuple):
+    """Un vídeo de salida con su resolución"""
+    path: str
+    width: int
+    height: int
 
 class VideoGenerator:
-    def __init__(self, width: int = 1920, height: int = 1080, fps: int = 30):
+    WARMUP_FRAMES = 8  # Frames dibujados (sin codificar) antes del inicio de un tramo
+    
+    def __init__(self, width: int = 1920, height: int = 1080, fps: int = 30,
+                 encoder: str = 'ffmpeg', preset: str = 'medium', crf: int = 23, threads: int = 0,
+                 workers: int = 1, chunk_size: int = 8, seed: int = None,
+                 lod: LODSettings = None, target_fps: float = None, pipeline_depth: int = 0,
+                 pcm_cache: PCMCache = None, rasterizer: str = 'opencv'):
         self.width = width
         self.height = height
         self.fps = fps
-        self.particle_system = ParticleSystem(width, height)
+        self.seed = seed
+        # Backend de dibujado: 'opencv', 'numpy' o 'numba' (ver raster.RASTERIZERS)
+        self.rasterizer = rasterizer
+        self.particle_system = ParticleSystem(width, height, seed=seed, rasterizer=rasterizer)
+        # Codificador: 'ffmpeg' (una sola pasada) o 'opencv' (ruta anterior con MoviePy)
+        self.encoder = encoder
+        self.encoder_options = {'preset': preset, 'crf': crf, 'threads': threads}
+        # Con workers > 1 el dibujado de frames se reparte en un pool de procesos
+        self.workers = workers
+        self.chunk_size = chunk_size
+        # Nivel de detalle (presupuestos de partículas y estelas) y, opcionalmente,
+        # un regulador que lo degrada para mantener `target_fps`
+        self.lod = lod
+        self.target_fps = target_fps
+        # Con pipeline_depth > 0 la mezcla y la codificación van en hilos propios,
+        # con como mucho ese número de frames en vuelo entre etapas
+        self.pipeline_depth = pipeline_depth
+        # Con caché de PCM el audio se mezcla desde el PCM ya decodificado
+        self.pcm_cache = pcm_cache
     
-    def _estimate_note_duration(self, frame_num: int, rms: np.ndarray, window_size: int = 10) -> float:
-        """Estima la duración de la nota actual basada en la energía del audio"""
-        start_idx = max(0, frame_num - window_size)
-        end_idx = min(len(rms), frame_num + window_size)
-        
-        # Buscar hacia adelante para encontrar la duración de la nota
-        current_rms = rms[frame_num]
-        threshold = current_rms * 0.7  # 70% del valor actual
+    def _audio_pcm(self, audio_path: str) -> Optional[PCMAudio]:
+        return self.pcm_cache.native(audio_path) if self.pcm_cache is not None and audio_path else None
+    
+    def _simulate(self, track: ControlTrack, start: int = 0, end: int = None, timer=None):
+        """Avanza la simulación de partículas un frame en cada iteración (frames [start, end))"""
+        timer = timer or self.particle_system.instrumentation
+        for frame_num in range(start, len(track) if end is None else end):
+            control = track[frame_num]
+            
+            # Crear partículas
+            with timer.stage('emit'):
+                self.particle_system.create_particles(
+                    int(control['particle_count']),
+                    intensity=float(control['intensity']),
+                    frequency=float(control['frequency']),
+                    energy=float(control['energy']),
+                    note_duration=float(control['note_duration'])
+                )
+            
+            # Actualizar partículas
+            with timer.stage('update'):
+                self.particle_system.update(1.0 / self.fps)
+            yield frame_num
+    
+    def _draw_frames(self, track: ControlTrack, compositor: FrameCompositor, stage: CompositeStage = None,
+                     start: int = 0, end: int = None, stats: deque = None):
+        """Genera los frames con las partículas dibujadas, antes de la mezcla con el anterior.
+
+        Con `stage` se dibuja en los lienzos del pipeline y se generan los lienzos.
+        Con `stats`, cada frame simulado añade (tiempos de simulación pendientes,
+        partículas, puntos de estela): con workers > 1 la simulación va por
+        delante del frame que sale del pool, y así cada frame se queda con los suyos.
+        """
+        parallel = stage is None and self.workers > 1
+        recorder = StageRecorder() if parallel and self.particle_system.instrumentation.enabled else None
+        steps = self._simulate(track, start, end, recorder)
+        if stats is not None:
+            steps = self._record_stats(steps, stats, recorder)
+        if stage is not None:
+            for _ in steps:
+                canvas = stage.acquire()
+                self.particle_system.draw(canvas.clear(), dirty=canvas.dirty)
+                yield canvas
+        elif self.workers > 1:
+            # La simulación sigue siendo secuencial; solo el dibujado va al pool
+            snapshots = (self.particle_system.snapshot() for _ in steps)
+            renderer = ParallelRenderer(self.width, self.height, self.workers, self.chunk_size, self.rasterizer)
+            yield from renderer.render(snapshots)
+        else:
+            for _ in steps:
+                # Dibujar sobre el lienzo reutilizado del compositor
+                frame = compositor.canvas()
+                self.particle_system.draw(frame, dirty=compositor.dirty)
+                yield frame
+    
+    def _record_stats(self, steps, stats: deque, recorder: StageRecorder = None):
+        system = self.particle_system
+        for frame_num in steps:
+            stats.append((recorder.take() if recorder is not None else {},
+                          system.particles.count, system.trails.count))
+            yield frame_num
+    
+    def _seek(self, track: ControlTrack, compositor: FrameCompositor, target: int,
+              checkpoints: CheckpointStore = None, signature: str = None):
+        """Lleva la simulación al inicio del frame `target` sin codificar nada.
+
+        Parte del último checkpoint anterior (si hay) y avanza sin dibujar;
+        los últimos WARMUP_FRAMES sí se dibujan y mezclan para que el rastro
+        del frame anterior sea prácticamente el mismo que en un render completo.
+        """
+        frame = 0
+        if checkpoints is not None:
+            found = checkpoints.latest(signature, target)
+            if found is not None:
+                exact = checkpoints.restore(signature, found, self.particle_system, compositor)
+                if exact and found == target:
+                    return
+                frame = found
         
-        duration = 0
-        for i in range(frame_num, end_idx):
-            if rms[i] >= threshold:
-                duration += 1
+        warmup_start = max(frame, target - self.WARMUP_FRAMES)
+        for frame_num in self._simulate(track, frame, warmup_start):
+            # Dejar checkpoints por el camino para la próxima vez; tras simular
+            # `frame_num` el estado es el del inicio del frame siguiente
+            if checkpoints is not None and (frame_num + 1) % checkpoints.interval == 0:
+                checkpoints.save(signature, frame_num + 1, self.particle_system)
+        compositor.reset()
+        for frame_num in self._simulate(track, warmup_start, target):
+            canvas = compositor.canvas()
+            self.particle_system.draw(canvas, dirty=compositor.dirty)
+            compositor.compose(canvas, float(track[frame_num]['blend_factor']))
+    
+    def _encode_frames(self, track: ControlTrack, compositor: FrameCompositor, out,
+                       start: int, end: int, timer, governor, on_frame: Callable[[int], None]):
+        """Dibuja, mezcla y escribe en `out` los frames [start, end) desde el estado actual"""
+        pipelined = self.pipeline_depth > 0 and self.workers == 1
+        compositor.instrumentation = NULL_INSTRUMENTATION if pipelined else timer
+        with ExitStack() as stack:
+            stage = None
+            if pipelined:
+                # dibujo (este hilo) -> mezcla (hilo) -> codificación (hilo)
+                writer = stack.enter_context(BackgroundEncoder(out, self.pipeline_depth))
+                stage = stack.enter_context(CompositeStage(compositor, writer, self.pipeline_depth))
             else:
+                stack.enter_context(out)
+            stats = deque()
+            frames = self._draw_frames(track, compositor, stage, start, end, stats)
+            # Cerrar el generador (y el pool de procesos) antes que el codificador
+            stack.callback(frames.close)
+            
+            for frame_num in range(start, end):
+                frame_start = time.perf_counter()
+                timer.begin_frame(frame_num)
+                frame = next(frames)
+                # Tiempos de simulación y poblaciones de este frame, no de los simulados por delante
+                times, particles, trail_points = stats.popleft()
+                timer.add(times)
+                blend_factor = float(track[frame_num]['blend_factor'])
+                
+                if stage is not None:
+                    stage.submit(frame, blend_factor)
+                else:
+                    # Mezcla con el frame anterior basada en la energía (más energía = menos rastro)
+                    # y un poco de desenfoque para suavizar
+                    frame = compositor.compose(frame, blend_factor)
+                    
+                    with timer.stage('write'):
+                        out.write(frame)
+                timer.end_frame(particles, trail_points)
+                
+                if governor is not None and governor.observe(time.perf_counter() - frame_start):
+                    self.particle_system.lod = governor.settings(particles, trail_points)
+                on_frame(frame_num)
+    
+    def _encode_segments(self, track: ControlTrack, compositor: FrameCompositor, output_path: str,
+                         audio_path, audio_pcm, start: int, end: int, checkpoints: CheckpointStore,
+                         timer, governor, on_frame: Callable[[int], None]):
+        """Renderiza [start, end) en segmentos de `checkpoints.interval` frames.
+
+        Tras cada segmento se guarda un checkpoint completo, de modo que si
+        el proceso muere se reanuda desde el último segmento terminado. Al
+        final los segmentos se unen sin recodificar y se añade el audio.
+        """
+        if not find_ffmpeg():
+            raise RuntimeError("Los renderizados con checkpoints necesitan ffmpeg")
+        signature = render_signature(track, self.width, self.height, self.seed, self.lod, self.target_fps,
+                                     self.rasterizer, self.encoder_options)
+        segment_dir = checkpoints.segment_dir(signature, start, end)
+        boundaries = list(range(start, end, checkpoints.interval))
+        segments = [checkpoints.segment_path(segment_dir, b) for b in boundaries]
+        
+        # Reanudar desde el último segmento terminado que tenga checkpoint completo
+        resume = 0
+        with_compositor = set(checkpoints.frames(signature, with_compositor=True))
+        for i in range(len(boundaries) - 1, 0, -1):
+            if boundaries[i] in with_compositor and all(os.path.exists(path) for path in segments[:i]):
+                checkpoints.restore(signature, boundaries[i], self.particle_system, compositor)
+                resume = i
                 break
+        else:
+            self._seek(track, compositor, start, checkpoints, signature)
+        
+        for i in range(resume, len(boundaries)):
+            seg_start, seg_end = boundaries[i], min(boundaries[i] + checkpoints.interval, end)
+            # Escribir a un nombre provisional: un segmento solo cuenta si se cerró bien
+            partial_path = segments[i] + '.partial.mp4'
+            out = FFmpegPipeEncoder(partial_path, self.width, self.height, self.fps, **self.encoder_options)
+            self._encode_frames(track, compositor, out, seg_start, seg_end, timer, governor, on_frame)
+            os.replace(partial_path, segments[i])
+            if seg_end < end:
+                checkpoints.save(signature, seg_end, self.particle_system, compositor)
         
-        return duration / self.fps  # Convertir frames a segundos
+        concat_segments(segments, output_path, self.fps, audio_path, start / self.fps, audio_pcm)
+        checkpoints.clear_segments(segment_dir)
     
     def generate_video(self, audio_features: dict, output_path: str, 
-                      progress_callback: Callable[[int, str], None]):
-        # Crear video temporal sin audio
-        temp_video_path = output_path + "_temp.mp4"
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(temp_video_path, fourcc, self.fps, (self.width, self.height))
-        
-        duration = audio_features['duration']
-        total_frames = int(duration * self.fps)
+                      progress_callback: Callable[[int, str], None],
+                      control_track: ControlTrack = None,
+                      instrumentation: Instrumentation = None,
+                      start_time: float = None, end_time: float = None,
+                      checkpoints: CheckpointStore = None,
+                      frame_callback: Callable[[int, int], None] = None):
+        """Renderiza y codifica el vídeo.
+
+        Con `instrumentation` se registran los tiempos de cada etapa por
+        frame; con workers > 1 el dibujado ocurre en otros procesos y solo
+        se miden la simulación, la mezcla y la escritura (y del nivel de
+        detalle solo se aplican los presupuestos, no el brillo ni las formas).
         
-        # Interpolar características
-        frames_times = np.linspace(0, duration, total_frames)
-        audio_times = np.linspace(0, duration, len(audio_features['rms']))
+        Con pipeline_depth > 0 (y workers == 1) se simula y dibuja en este
+        hilo mientras otro mezcla y otro codifica; el resultado es idéntico.
+        La mezcla y la escritura no se miden en ese modo.
         
-        rms = np.interp(frames_times, audio_times, audio_features['rms'])
-        spec_centroids = np.interp(frames_times, audio_times, audio_features['spectral_centroids'])
-        spec_rolloff = np.interp(frames_times, audio_times, audio_features['spectral_rolloff'])
+        `start_time`/`end_time` (segundos) limitan el vídeo a ese tramo: la
+        simulación llega al inicio desde el checkpoint más cercano o
+        avanzando sin dibujar. Con `checkpoints` el vídeo se codifica por
+        segmentos con un checkpoint tras cada uno, y un renderizado
+        interrumpido se reanuda al volver a lanzarlo con los mismos datos.
         
-        # Normalizar características
-        rms_norm = (rms - rms.min()) / (rms.max() - rms.min() + 1e-6)
-        spec_norm = (spec_centroids - spec_centroids.min()) / (spec_centroids.max() - spec_centroids.min() + 1e-6)
-        energy_norm = (spec_rolloff - spec_rolloff.min()) / (spec_rolloff.max() - spec_rolloff.min() + 1e-6)
+        `frame_callback(hechos, total)` se llama tras cada frame codificado.
+        """
+        # Parámetros de cada frame calculados de antemano (o cargados de disco)
+        track = control_track if control_track is not None else ControlTrack.from_features(audio_features, self.fps)
+        start = 0 if start_time is None else min(len(track), max(0, int(round(start_time * self.fps))))
+        end = len(track) if end_time is None else min(len(track), max(start, int(round(end_time * self.fps))))
+        total_frames = max(1, end - start)
+        audio_path = audio_features.get('audio_path')
+        audio_pcm = self._audio_pcm(audio_path)
         
-        prev_frame = None
+        # Buffers de frame reutilizados durante todo el vídeo
+        compositor = FrameCompositor(self.width, self.height)
+        timer = instrumentation or NULL_INSTRUMENTATION
+        self.particle_system.instrumentation = timer
+        governor = QualityGovernor(self.target_fps, self.lod) if self.target_fps else None
+        self.particle_system.lod = governor.base if governor else self.lod
         
-        # Añadir un fondo gradual
-        background = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        def on_frame(frame_num: int):
+            progress = int((frame_num - start + 1) / total_frames * 80)
+            progress_callback(progress, f"Generando video: {progress}%")
+            if frame_callback is not None:
+                frame_callback(frame_num - start + 1, total_frames)
         
-        for frame_num in range(total_frames):
-            # Crear frame con fondo gradual
-            frame = background.copy()
-            
-            # Obtener características normalizadas
-            intensity = rms_norm[frame_num]
-            frequency = spec_norm[frame_num]
-            energy = energy_norm[frame_num]
-            
-            # Estimar duración de la nota actual
-            note_duration = self._estimate_note_duration(frame_num, rms_norm)
-            
-            # Crear partículas
-            base_particles = 10
-            energy_boost = energy * 30
-            intensity_boost = intensity * 20
-            num_particles = int(base_particles + energy_boost + intensity_boost)
-            
-            for _ in range(num_particles):
-                self.particle_system.create_particle(
-                    intensity=intensity,
-                    frequency=frequency,
-                    energy=energy,
-                    note_duration=note_duration
+        try:
+            if checkpoints is not None:
+                self._encode_segments(track, compositor, output_path, audio_path, audio_pcm, start, end,
+                                      checkpoints, timer, governor, on_frame)
+            else:
+                if start > 0:
+                    self._seek(track, compositor, start)
+                # Codificador que recibe los frames y mezcla el audio
+                out = create_encoder(
+                    self.encoder, output_path, self.width, self.height, self.fps,
+                    audio_path=audio_path, audio_start=start / self.fps, audio_pcm=audio_pcm,
+                    **self.encoder_options
                 )
-            
-            # Actualizar y dibujar partículas
-            self.particle_system.update(1.0 / self.fps)
-            self.particle_system.draw(frame)
-            
-            # Mejorar el efecto de desvanecimiento
-            if prev_frame is not None:
-                # Ajustar la mezcla basada en la energía
-                blend_factor = 0.85 - (energy * 0.3)  # Más energía = menos rastro
-                frame = cv2.addWeighted(frame, blend_factor, prev_frame, 1 - blend_factor, 0)
-            
-            prev_frame = frame.copy()
-            
-            # Aplicar un poco de desenfoque para suavizar
-            frame = cv2.GaussianBlur(frame, (3, 3), 0)
-            
-            out.write(frame)
-            
-            progress = int((frame_num + 1) / total_frames * 80)
-            progress_callback(progress, f"Generando video: {progress}%")
+                self._encode_frames(track, compositor, out, start, end, timer, governor, on_frame)
+            progress_callback(90, "Combinando video con audio...")
+        finally:
+            timer.finish()
+            self.particle_system.instrumentation = NULL_INSTRUMENTATION
+        
+        progress_callback(100, "¡Video completado!")
+    
+    def generate_videos(self, audio_features: dict, outputs: List[VideoOutput],
+                        progress_callback: Callable[[int, str], None],
+                        control_track: ControlTrack = None, queue_size: int = 4,
+                        frame_callback: Callable[[int, int], None] = None):
+        """Renderiza varios vídeos (resoluciones o relaciones de aspecto distintas) con una sola simulación.
+
+        La simulación corre una vez en el espacio de `width` x `height` y
+        cada frame se rasteriza para cada salida escalando las coordenadas
+        por eje, como si estuvieran normalizadas. Cada salida tiene su propio
+        compositor y su codificador, que escribe desde un hilo aparte.
+        """
+        track = control_track if control_track is not None else ControlTrack.from_features(audio_features, self.fps)
+        total_frames = len(track)
+        self.particle_system.lod = self.lod
         
-        out.release()
+        audio_path = audio_features.get('audio_path')
+        audio_pcm = self._audio_pcm(audio_path)
         
-        # Combinar video con audio usando moviepy
-        progress_callback(90, "Combinando video con audio...")
-        try:
-            video = VideoFileClip(temp_video_path)
-            audio = AudioFileClip(audio_features['audio_path'])
-            
-            final_video = video.set_audio(audio)
-            final_video.write_videofile(
-                output_path,
-                codec='libx264',
-                audio_codec='aac',
-                temp_audiofile=output_path + "_temp_audio.m4a",
-                remove_temp=True
-            )
+        targets = []
+        with ExitStack() as stack:
+            for output in outputs:
+                encoder = create_encoder(
+                    self.encoder, output.path, output.width, output.height, self.fps,
+                    audio_path=audio_path, audio_pcm=audio_pcm, **self.encoder_options
+                )
+                scale = (output.width / self.width, output.height / self.height)
+                targets.append((FrameCompositor(output.width, output.height), scale,
+                                stack.enter_context(BackgroundEncoder(encoder, queue_size))))
             
-            # Limpiar
-            video.close()
-            audio.close()
-            if os.path.exists(temp_video_path):
-                os.remove(temp_video_path)
+            for frame_num in self._simulate(track):
+                blend_factor = float(track[frame_num]['blend_factor'])
+                for compositor, scale, out in targets:
+                    frame = compositor.canvas()
+                    self.particle_system.draw(frame, dirty=compositor.dirty, scale=scale)
+                    out.write(compositor.compose(frame, blend_factor))
                 
-            progress_callback(100, "¡Video completado!")
+                progress = int((frame_num + 1) / total_frames * 80)
+                progress_callback(progress, f"Generando videos: {progress}%")
+                if frame_callback is not None:
+                    frame_callback(frame_num + 1, total_frames)
             
-        except Exception as e:
-            raise Exception(f"Error al combinar audio y video: {str(e)}")
\ No newline at end of file
+            progress_callback(90, "Combinando videos con audio...")
+        
+        progress_callback(100, "¡Videos completados!")
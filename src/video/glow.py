@@ -0,0 +1,73 @@
+import numpy as np
+import cv2
+from typing import Dict, Tuple
+
+class GlowLayer:
+    """Capa de brillo acumulado para todas las partículas de un frame.
+
+    En lugar de desenfocar una máscara a pantalla completa por partícula,
+    cada brillo se estampa como un sprite ya desenfocado dentro de su ROI
+    y la capa se suma al frame una sola vez.
+    """
+
+    BLUR_KERNEL = 21
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.layer = np.zeros((height, width, 3), dtype=np.float32)
+        self._sprites: Dict[int, np.ndarray] = {}
+        self._bounds = None  # (x0, y0, x1, y1) de la zona tocada en este frame
+
+    @classmethod
+    def extent(cls, radius):
+        """Radio (en píxeles) que alcanza un brillo de radio `radius`; admite arrays"""
+        return np.maximum(radius, 0) + cls.BLUR_KERNEL // 2
+
+    def sprite(self, radius: int) -> np.ndarray:
+        """Disco de radio `radius` desenfocado, con margen para el kernel"""
+        sprite = self._sprites.get(radius)
+        if sprite is None:
+            half = int(self.extent(radius))
+            mask = np.zeros((2 * half + 1, 2 * half + 1), dtype=np.uint8)
+            cv2.circle(mask, (half, half), radius, 255, -1)
+            mask = cv2.GaussianBlur(mask, (self.BLUR_KERNEL, self.BLUR_KERNEL), 0)
+            sprite = mask.astype(np.float32)[:, :, None]
+            self._sprites[radius] = sprite
+        return sprite
+
+    def add(self, x: int, y: int, radius: int, color: Tuple[int, int, int], strength: float):
+        """Acumula un brillo centrado en (x, y) con intensidad `color * strength / 255`"""
+        sprite = self.sprite(max(0, radius))
+        half = sprite.shape[0] // 2
+        x0, y0 = max(0, x - half), max(0, y - half)
+        x1, y1 = min(self.width, x + half + 1), min(self.height, y + half + 1)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        weights = np.asarray(color, dtype=np.float32) * (strength / 255.0)
+        sx, sy = x0 - (x - half), y0 - (y - half)
+        patch = sprite[sy:sy + (y1 - y0), sx:sx + (x1 - x0)]
+        self.layer[y0:y1, x0:x1] += patch * weights
+        self.mark(x0, y0, x1, y1)
+
+    def mark(self, x0: int, y0: int, x1: int, y1: int):
+        """Amplía la zona tocada de la capa (la que se suma en `composite`)"""
+        if self._bounds is None:
+            self._bounds = (x0, y0, x1, y1)
+        else:
+            bx0, by0, bx1, by1 = self._bounds
+            self._bounds = (min(bx0, x0), min(by0, y0), max(bx1, x1), max(by1, y1))
+
+    def composite(self, frame: np.ndarray):
+        """Suma la capa acumulada al frame (saturando) y la deja limpia"""
+        if self._bounds is None:
+            return
+        x0, y0, x1, y1 = self._bounds
+        roi = self.layer[y0:y1, x0:x1]
+        roi += frame[y0:y1, x0:x1]
+        np.rint(roi, out=roi)
+        np.clip(roi, 0, 255, out=roi)
+        frame[y0:y1, x0:x1] = roi
+        roi.fill(0)
+        self._bounds = None
@@ -0,0 +1,237 @@
+import cProfile
+import csv
+import json
+import time
+import numpy as np
+from typing import Callable, Dict, Optional, Tuple
+
+# Etapas del bucle de renderizado, en el orden en que se ejecutan
+STAGES = ('emit', 'update', 'trails', 'draw', 'glow', 'blend', 'blur', 'write')
+
+class _NullStage:
+    """Contexto vacío: medir una etapa sin instrumentación no cuesta casi nada"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullInstrumentation:
+    """Instrumentación desactivada; todas las operaciones son no-ops"""
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name: str):
+        return self._stage
+
+    def begin_frame(self, frame_num: int):
+        pass
+
+    def end_frame(self, particles: int = 0, trails: int = 0):
+        pass
+
+    def add(self, times: Dict[str, float]):
+        pass
+
+    def finish(self):
+        pass
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
+
+
+class _RecordedStage:
+    __slots__ = ('owner', 'name', 'start')
+
+    def __init__(self, owner: 'StageRecorder', name: str):
+        self.owner = owner
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        times = self.owner.times
+        times[self.name] = times.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class StageRecorder(NullInstrumentation):
+    """Acumula tiempos por etapa fuera de un frame, para sumarlos luego al suyo con `add`.
+
+    Sirve cuando la simulación va por delante del frame que se está
+    escribiendo (dibujado en un pool de procesos).
+    """
+    enabled = True
+
+    def __init__(self):
+        self.times: Dict[str, float] = {}
+
+    def stage(self, name: str):
+        return _RecordedStage(self, name)
+
+    def take(self) -> Dict[str, float]:
+        """Los tiempos acumulados desde la última llamada"""
+        times, self.times = self.times, {}
+        return times
+
+
+class _Stage:
+    __slots__ = ('owner', 'index', 'start')
+
+    def __init__(self, owner: 'Instrumentation', index: int):
+        self.owner = owner
+        self.index = index
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.owner._current[self.index] += time.perf_counter() - self.start
+        return False
+
+
+class Instrumentation(NullInstrumentation):
+    """Tiempos por frame de cada etapa del renderizado y recuento de partículas.
+
+    `profile_frames=(inicio, fin)` activa un perfilador (cProfile por defecto,
+    o el que devuelva `profiler_factory`, con métodos enable/disable) solo
+    entre esos frames; con `profile_output` se guardan sus estadísticas.
+    """
+    enabled = True
+
+    def __init__(self, profile_frames: Optional[Tuple[int, int]] = None,
+                 profile_output: Optional[str] = None,
+                 profiler_factory: Callable = cProfile.Profile):
+        self.frames = []         # número de frame de cada fila
+        self.timings = []        # segundos por etapa de cada frame
+        self.counts = []         # (partículas, puntos de estela) de cada frame
+        self._stages = {name: _Stage(self, i) for i, name in enumerate(STAGES)}
+        self._current = [0.0] * len(STAGES)
+        self._frame_start = 0.0
+        self.frame_times = []
+        self.profile_frames = profile_frames
+        self.profile_output = profile_output
+        self.profiler = profiler_factory() if profile_frames else None
+        self._profiling = False
+
+    def stage(self, name: str):
+        return self._stages[name]
+
+    def begin_frame(self, frame_num: int):
+        self._current = [0.0] * len(STAGES)
+        self.frames.append(frame_num)
+        if self.profiler is not None and not self._profiling:
+            start, end = self.profile_frames
+            if start <= frame_num < end:
+                self.profiler.enable()
+                self._profiling = True
+        self._frame_start = time.perf_counter()
+
+    def add(self, times: Dict[str, float]):
+        """Suma al frame actual tiempos medidos fuera de él (ver StageRecorder)"""
+        for name, seconds in times.items():
+            self._current[self._stages[name].index] += seconds
+
+    def end_frame(self, particles: int = 0, trails: int = 0):
+        self.frame_times.append(time.perf_counter() - self._frame_start)
+        self.timings.append(self._current)
+        self.counts.append((particles, trails))
+        if self._profiling and self.frames[-1] + 1 >= self.profile_frames[1]:
+            self._stop_profiler()
+
+    def _stop_profiler(self):
+        self.profiler.disable()
+        self._profiling = False
+        if self.profile_output and hasattr(self.profiler, 'dump_stats'):
+            self.profiler.dump_stats(self.profile_output)
+
+    def finish(self):
+        """Cierra el perfilador si el vídeo terminó antes del final del rango"""
+        if self._profiling:
+            self._stop_profiler()
+
+    def timeline(self) -> Dict[str, np.ndarray]:
+        """Columnas de la línea de tiempo: frame, total, una por etapa y recuentos"""
+        timings = np.array(self.timings, dtype=np.float64).reshape(-1, len(STAGES))
+        counts = np.array(self.counts, dtype=np.int64).reshape(-1, 2)
+        columns = {'frame': np.array(self.frames, dtype=np.int64),
+                   'total': np.array(self.frame_times, dtype=np.float64)}
+        columns.update({name: timings[:, i] for i, name in enumerate(STAGES)})
+        columns['particles'] = counts[:, 0]
+        columns['trail_points'] = counts[:, 1]
+        return columns
+
+    def summary(self, bins: int = 12) -> dict:
+        """Estadísticas por etapa (ms) con un histograma de bins logarítmicos"""
+        columns = self.timeline()
+        summary = {}
+        for name in ('total',) + STAGES:
+            ms = columns[name] * 1000
+            if len(ms) == 0:
+                continue
+            positive = ms[ms > 0]
+            if len(positive):
+                edges = np.geomspace(positive.min(), max(positive.max(), positive.min() * 1.01), bins + 1)
+                hist, _ = np.histogram(positive, edges)
+            else:
+                edges, hist = np.zeros(0), np.zeros(0, dtype=np.int64)
+            summary[name] = {
+                'total_ms': float(ms.sum()),
+                'mean_ms': float(ms.mean()),
+                'p50_ms': float(np.percentile(ms, 50)),
+                'p95_ms': float(np.percentile(ms, 95)),
+                'max_ms': float(ms.max()),
+                'histogram': {'edges_ms': edges.tolist(), 'counts': hist.tolist()},
+            }
+        for name in ('particles', 'trail_points'):
+            values = columns[name]
+            if len(values):
+                summary[name] = {'mean': float(values.mean()), 'max': int(values.max())}
+        return summary
+
+    def format_summary(self, width: int = 30) -> str:
+        """Resumen legible: reparto del tiempo por etapa e histograma del tiempo por frame"""
+        summary = self.summary()
+        if 'total' not in summary:
+            return "Sin frames medidos"
+        total = summary['total']['total_ms'] or 1.0
+        lines = [f"{len(self.frames)} frames, {summary['total']['mean_ms']:.2f} ms/frame de media",
+                 f"{'etapa':<8}{'media':>9}{'p95':>9}{'máx':>9}  reparto"]
+        for name in STAGES:
+            s = summary[name]
+            bar = '#' * int(round(s['total_ms'] / total * width))
+            lines.append(f"{name:<8}{s['mean_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['max_ms']:>9.2f}  {bar}")
+
+        hist = summary['total']['histogram']
+        if hist['counts']:
+            lines.append("Tiempo por frame (ms):")
+            peak = max(hist['counts']) or 1
+            edges = hist['edges_ms']
+            for i, count in enumerate(hist['counts']):
+                bar = '#' * int(round(count / peak * width))
+                lines.append(f"{edges[i]:>8.2f}-{edges[i + 1]:<8.2f}{count:>6}  {bar}")
+        if 'particles' in summary:
+            lines.append(f"Partículas: media {summary['particles']['mean']:.0f}, "
+                         f"máx {summary['particles']['max']}; puntos de estela: media "
+                         f"{summary['trail_points']['mean']:.0f}, máx {summary['trail_points']['max']}")
+        return '\n'.join(lines)
+
+    def save(self, path: str):
+        """Guarda la línea de tiempo como CSV (si `path` acaba en .csv) o JSON con resumen"""
+        columns = self.timeline()
+        if path.lower().endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(columns.keys())
+                writer.writerows(zip(*(c.tolist() for c in columns.values())))
+        else:
+            with open(path, 'w') as f:
+                json.dump({'stages': STAGES,
+                           'timeline': {name: c.tolist() for name, c in columns.items()},
+                           'summary': self.summary()}, f, indent=2)
@@ -0,0 +1,105 @@
+import numpy as np
+from dataclasses import dataclass, replace
+from typing import Optional
+
+@dataclass
+class LODSettings:
+    """Nivel de detalle: presupuestos y umbrales que limitan el coste de cada frame.
+
+    Con los valores por defecto solo se eliminan las partículas que ya no
+    se ven (demasiado pequeñas u oscuras); el resto de mandos se activan
+    al fijar presupuestos o los sube el `QualityGovernor`.
+    """
+    max_particles: Optional[int] = None     # partículas vivas como máximo
+    max_trail_points: Optional[int] = None  # puntos de estela como máximo
+    min_size: float = 0.5                   # tamaño visible mínimo (px)
+    min_brightness: float = 2.0             # brillo mínimo (0-255) del color ya atenuado
+    glow_importance: float = 0.0            # importancia mínima para dibujar brillo
+    detail_importance: float = 0.0          # por debajo, formas simplificadas (círculo sin AA)
+
+    def degraded(self, level: int, particles: int, trail_points: int) -> 'LODSettings':
+        """Ajustes para el nivel de degradación `level` (0 = estos mismos).
+
+        `particles` y `trail_points` son las poblaciones de las que se parte
+        para los presupuestos que no se fijaron.
+        """
+        if level <= 0:
+            return self
+        budget = self.max_particles if self.max_particles is not None else max(particles, 1)
+        trail_budget = self.max_trail_points if self.max_trail_points is not None else max(trail_points, 1)
+        return replace(
+            self,
+            max_particles=max(50, int(budget * 0.8 ** level)),
+            max_trail_points=max(500, int(trail_budget * 0.7 ** level)),
+            glow_importance=min(1.0, self.glow_importance + 0.1 * level),
+            detail_importance=min(1.0, self.detail_importance + 0.15 * level),
+        )
+
+
+def select_particles(store, settings: LODSettings) -> np.ndarray:
+    """Máscara de partículas que se conservan según `settings`.
+
+    Vida y tamaño solo decrecen, así que lo que hoy es invisible ya no
+    volverá a verse y puede eliminarse de la simulación.
+    """
+    life = store.life
+    visible = (store.size * life >= settings.min_size) & \
+              (store.color.max(axis=1) * life >= settings.min_brightness)
+    if settings.max_particles is not None and settings.max_particles <= 0:
+        # Presupuesto nulo: argpartition(-0) seleccionaría todas
+        return np.zeros_like(visible)
+    if settings.max_particles is not None and np.count_nonzero(visible) > settings.max_particles:
+        # Sobre el presupuesto: quedarse con las más visibles e importantes
+        score = np.where(visible, store.size * life * (0.5 + store.importance), -1.0)
+        keep = np.argpartition(score, -settings.max_particles)[-settings.max_particles:]
+        visible = np.zeros_like(visible)
+        visible[keep] = True
+    return visible
+
+
+class QualityGovernor:
+    """Ajusta el nivel de detalle para mantener `target_fps`.
+
+    Cada `window` frames compara el tiempo medio por frame con el
+    presupuesto: si se pasa sube un nivel de degradación y si va muy
+    holgado lo baja, de modo que la salida pierde detalle poco a poco en
+    lugar de atascarse.
+    """
+
+    MAX_LEVEL = 8
+
+    def __init__(self, target_fps: float, settings: Optional[LODSettings] = None, window: int = 15):
+        self.target_fps = target_fps
+        self.base = settings or LODSettings()
+        self.window = window
+        self.level = 0
+        self._times = []
+        self._reference = None  # (partículas, estelas) al empezar a degradar
+
+    @property
+    def budget(self) -> float:
+        return 1.0 / self.target_fps
+
+    def settings(self, particles: int, trail_points: int) -> LODSettings:
+        """Ajustes del nivel actual, dadas las poblaciones actuales"""
+        if self.level == 0:
+            self._reference = None
+            return self.base
+        if self._reference is None:
+            self._reference = (particles, trail_points)
+        return self.base.degraded(self.level, *self._reference)
+
+    def observe(self, frame_time: float) -> bool:
+        """Registra el tiempo de un frame; devuelve True si cambió el nivel"""
+        self._times.append(frame_time)
+        if len(self._times) < self.window:
+            return False
+        mean = sum(self._times) / len(self._times)
+        self._times.clear()
+        if mean > self.budget and self.level < self.MAX_LEVEL:
+            self.level += 1
+            return True
+        if mean < self.budget * 0.6 and self.level > 0:
+            self.level -= 1
+            return True
+        return False
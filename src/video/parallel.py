@@ -0,0 +1,62 @@
+import multiprocessing
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List
+from .particles import ParticleSystem
+
+# Sistema de partículas propio de cada proceso (cachés de sprites y brillo)
+_worker_system = None
+
+def _init_worker(width: int, height: int, rasterizer: str = 'opencv'):
+    global _worker_system
+    _worker_system = ParticleSystem(width, height, max_trail_points=1, rasterizer=rasterizer)
+
+def _render_chunk(snapshots: List[dict]) -> List[np.ndarray]:
+    """Dibuja un bloque de frames a partir de sus instantáneas"""
+    frames = []
+    for snapshot in snapshots:
+        frame = np.zeros((_worker_system.height, _worker_system.width, 3), dtype=np.uint8)
+        _worker_system.draw(frame, snapshot)
+        frames.append(frame)
+    return frames
+
+
+class ParallelRenderer:
+    """Rasteriza instantáneas de partículas en un pool de procesos.
+
+    Los frames se entregan en el mismo orden en que llegan las instantáneas;
+    como mucho hay `workers * 2` bloques en vuelo para acotar la memoria.
+    Los procesos se crean con 'spawn': con fork heredarían los descriptores
+    abiertos (como el stdin de ffmpeg) y el codificador nunca vería el EOF.
+    """
+
+    def __init__(self, width: int, height: int, workers: int, chunk_size: int = 8,
+                 rasterizer: str = 'opencv'):
+        self.width = width
+        self.height = height
+        self.workers = workers
+        self.chunk_size = max(1, chunk_size)
+        self.rasterizer = rasterizer  # Backend de dibujado de cada proceso (por nombre)
+
+    def _chunks(self, snapshots: Iterable[dict]) -> Iterator[List[dict]]:
+        chunk = []
+        for snapshot in snapshots:
+            chunk.append(snapshot)
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def render(self, snapshots: Iterable[dict]) -> Iterator[np.ndarray]:
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker,
+                                 initargs=(self.width, self.height, self.rasterizer)) as executor:
+            pending = deque()
+            for chunk in self._chunks(snapshots):
+                pending.append(executor.submit(_render_chunk, chunk))
+                if len(pending) >= self.workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
@@ -0,0 +1,111 @@
+import numpy as np
+from typing import Dict
+
+# Códigos de forma almacenados en el array `shape`
+SHAPE_TYPES = ('circle', 'square', 'star', 'triangle')
+SHAPE_CODES = {name: code for code, name in enumerate(SHAPE_TYPES)}
+
+# Campo -> (dtype, forma por partícula)
+FIELDS = {
+    'x': (np.float32, ()),
+    'y': (np.float32, ()),
+    'vx': (np.float32, ()),
+    'vy': (np.float32, ()),
+    'size': (np.float32, ()),
+    'color': (np.uint8, (3,)),
+    'trail_color': (np.uint8, (3,)),
+    'life': (np.float32, ()),
+    'max_life': (np.float32, ()),
+    'acceleration': (np.float32, ()),
+    'rotation': (np.float32, ()),
+    'shape': (np.int8, ()),
+    'wave_amplitude': (np.float32, ()),
+    'wave_frequency': (np.float32, ()),
+    'phase': (np.float32, ()),
+    'trail_length': (np.float32, ()),
+    'importance': (np.float32, ()),
+    'sustain': (np.float32, ()),
+    'pitch': (np.float32, ()),
+    'intensity': (np.float32, ()),
+    'has_trail': (np.bool_, ()),
+}
+
+
+class ParticleStore:
+    """Almacén de partículas como estructura de arrays contiguos.
+
+    Cada campo vive en su propio array; `store.x`, `store.life`, etc.
+    devuelven vistas sobre las `len(store)` partículas vivas, de modo que
+    las operaciones in-place modifican el almacén directamente.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = max(1, capacity)
+        self.count = 0
+        self._data: Dict[str, np.ndarray] = {
+            name: np.zeros((self.capacity,) + shape, dtype=dtype)
+            for name, (dtype, shape) in FIELDS.items()
+        }
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        data = self.__dict__.get('_data')
+        if data is not None and name in data:
+            return data[name][:self.count]
+        raise AttributeError(name)
+
+    def __setattr__(self, name: str, value):
+        data = self.__dict__.get('_data')
+        if data is not None and name in data:
+            # `store.x += ...` reasigna la propia vista: no hace falta copiar
+            if not (isinstance(value, np.ndarray) and value.base is data[name]):
+                data[name][:self.count] = value
+            return
+        super().__setattr__(name, value)
+
+    def _reserve(self, extra: int):
+        """Garantiza espacio para `extra` partículas más (crecimiento geométrico)"""
+        needed = self.count + extra
+        if needed <= self.capacity:
+            return
+        new_capacity = self.capacity
+        while new_capacity < needed:
+            new_capacity *= 2
+        for name, arr in self._data.items():
+            grown = np.zeros((new_capacity,) + arr.shape[1:], dtype=arr.dtype)
+            grown[:self.count] = arr[:self.count]
+            self._data[name] = grown
+        self.capacity = new_capacity
+
+    def extend(self, n: int, **values):
+        """Añade `n` partículas; cada valor puede ser un escalar o un array de longitud `n`"""
+        if n <= 0:
+            return
+        self._reserve(n)
+        start, end = self.count, self.count + n
+        for name, arr in self._data.items():
+            arr[start:end] = values.get(name, 0)
+        self.count = end
+
+    def compact(self, keep: np.ndarray):
+        """Elimina las partículas cuya entrada en la máscara `keep` es False"""
+        kept = int(np.count_nonzero(keep))
+        if kept == self.count:
+            return
+        for arr in self._data.values():
+            arr[:kept] = arr[:self.count][keep]
+        self.count = kept
+
+    def clear(self):
+        self.count = 0
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """Copia de los campos de las partículas vivas (para checkpoints)"""
+        return {name: arr[:self.count].copy() for name, arr in self._data.items()}
+
+    def load_state(self, state: Dict[str, np.ndarray]):
+        """Sustituye las partículas por las de `state`"""
+        self.clear()
+        self.extend(len(state['x']), **{name: state[name] for name in self._data})
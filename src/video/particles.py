@@ -1,43 +1,81 @@
+import json
 import numpy as np
-from dataclasses import dataclass
-from typing import List, Tuple
 import cv2
-import math
+from typing import NamedTuple, Optional, Union
+from .particle_store import ParticleStore, SHAPE_CODES
+from .glow import GlowLayer
+from .sprites import SpriteAtlas
+from .trails import Scale, TrailBuffer, split_scale
+from .instrument import NULL_INSTRUMENTATION
+from .lod import LODSettings, select_particles
+from .raster import Rasterizer, create_rasterizer
 
-@dataclass
-class Particle:
-    x: float
-    y: float
-    size: float
-    color: Tuple[int, int, int]
-    velocity: Tuple[float, float]
-    life: float
-    max_life: float
-    acceleration: float
-    rotation: float
-    shape_type: str
-    wave_amplitude: float
-    wave_frequency: float
-    phase: float
-    trail_length: float  # Para estelas
-    importance: float    # Qué tan importante es el sonido
-    sustain: float      # Duración del sonido
-    pitch: float        # Tono del sonido
-    intensity: float    # Intensidad del sonido
-    has_trail: bool     # Si debe dejar estela
-    trail_color: Tuple[int, int, int]  # Color de la estela
+# Campos de partícula que necesita `draw`
+DRAW_FIELDS = ('x', 'y', 'size', 'life', 'color', 'importance', 'shape', 'rotation')
+
+class DrawBatch(NamedTuple):
+    """Datos de dibujado de las partículas de un frame, ya en enteros de píxel"""
+    order: np.ndarray
+    xs: np.ndarray
+    ys: np.ndarray
+    sizes: np.ndarray
+    alphas: np.ndarray
+    colors: np.ndarray
+    tints: np.ndarray
+    shapes: np.ndarray
+    rotations: np.ndarray
+    glowing: np.ndarray
+    simple: Optional[np.ndarray] = None  # partículas dibujadas como círculo simple (LOD)
+
+def _build_hsv_lut() -> np.ndarray:
+    """Tabla [tono, saturación] -> BGR en [0, 1] para un valor (V) de 1.0.
+
+    HSV2BGR es lineal en V, así que el color final es `lut[h, s] * v`.
+    """
+    hue, sat = np.meshgrid(np.arange(256), np.arange(256), indexing='ij')
+    hsv = np.empty((256, 256, 3), dtype=np.float32)
+    hsv[..., 0] = (hue * 2) % 360  # OpenCV usa tonos 0-179 en 8 bits
+    hsv[..., 1] = sat / 255.0
+    hsv[..., 2] = 1.0
+    return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+
+_HSV_LUT = _build_hsv_lut()
+
+def hsv_to_bgr(hue: int, saturation: int, value: int) -> tuple:
+    """Convierte un color HSV de 8 bits a BGR usando la tabla precalculada"""
+    # El tono se envuelve a 8 bits como hacía np.uint8 con la conversión antigua
+    bgr = _HSV_LUT[hue & 0xFF, saturation] * value
+    return tuple(int(c) for c in np.rint(bgr))
 
 class ParticleSystem:
-    def __init__(self, width: int, height: int):
+    def __init__(self, width: int, height: int, max_trail_points: int = 200_000, seed: int = None,
+                 rasterizer: Union[str, Rasterizer] = 'opencv'):
         self.width = width
         self.height = height
-        self.particles: List[Particle] = []
+        self.rng = np.random.default_rng(seed)
+        self.particles = ParticleStore()
         self.max_height = height * 0.95  # Usar 95% de la altura
-        self.trail_history = []  # Almacenar posiciones anteriores para estelas
+        self.trails = TrailBuffer(max_trail_points)  # Posiciones anteriores para estelas
+        self.glow = GlowLayer(width, height)
+        self._scaled_glows = {}  # Capas de brillo para dibujar a otros tamaños
+        self.sprites = SpriteAtlas()
+        self.instrumentation = NULL_INSTRUMENTATION  # Tiempos de trails/draw/glow (opcional)
+        self.lod: Optional[LODSettings] = None  # Nivel de detalle (None = sin límites)
+        self.rasterizer = create_rasterizer(rasterizer)  # Backend de dibujado ('opencv', 'numpy', 'numba')
     
     def create_particle(self, intensity: float, frequency: float, energy: float, note_duration: float = 1.0):
-        x = np.random.randint(0, self.width)
-        y = self.height - np.random.randint(0, 50)
+        self.create_particles(1, intensity, frequency, energy, note_duration)
+    
+    def create_particles(self, n: int, intensity: float, frequency: float, energy: float,
+                         note_duration: float = 1.0):
+        """Emite `n` partículas de golpe con las mismas características de audio"""
+        if n <= 0:
+            return
+        
+        # Todos los valores aleatorios en una sola llamada: x, y, ángulo, rotación, fase
+        rand = self.rng.random((5, n))
+        x = (rand[0] * self.width).astype(np.int32)
+        y = self.height - (rand[1] * 50).astype(np.int32)
         
         # Análisis de importancia del sonido
         importance = (intensity * 0.4 + energy * 0.4 + frequency * 0.2)
@@ -49,7 +87,7 @@ class ParticleSystem:
         hue = int((frequency * 360) % 360)
         saturation = int(min(255, (energy * 0.7 + 0.3) * 255))
         value = int(min(255, (intensity * 0.7 + 0.3) * 255))
-        color = cv2.cvtColor(np.uint8([[[hue, saturation, value]]]), cv2.COLOR_HSV2BGR)[0][0]
+        color = hsv_to_bgr(hue, saturation, value)
         
         # Color de estela (más suave y transparente)
         trail_color = tuple(int(c * 0.7) for c in color)
@@ -62,7 +100,8 @@ class ParticleSystem:
         vy_base = -base_speed * max_height_factor
         
         # Movimiento horizontal más pronunciado para sonidos sostenidos
-        angle = np.random.uniform(-45, 45) if is_sustained else np.random.uniform(-30, 30)
+        spread = 45 if is_sustained else 30
+        angle = rand[2] * (2 * spread) - spread
         vx_base = base_speed * np.sin(np.radians(angle)) * (1 + note_duration * 0.5)
         
         # Ajustar velocidades con variaciones
@@ -80,20 +119,22 @@ class ParticleSystem:
         has_trail = is_sustained or importance > 0.7
         trail_length = note_duration * 2 if has_trail else 0
         
-        particle = Particle(
+        self.particles.extend(
+            n,
             x=x,
             y=y,
             size=max(4, (intensity * energy) * 25),  # Partículas más grandes
             color=color,
-            velocity=(vx, vy),
+            vx=vx,
+            vy=vy,
             life=1.0,
             max_life=max_life,
             acceleration=0.03 + energy * 0.08,
-            rotation=np.random.rand() * 360,
-            shape_type=self._get_shape_type(frequency, importance),
+            rotation=rand[3] * 360,
+            shape=SHAPE_CODES[self._get_shape_type(frequency, importance)],
             wave_amplitude=wave_amplitude,
             wave_frequency=wave_frequency,
-            phase=np.random.uniform(0, 2 * np.pi),
+            phase=rand[4] * (2 * np.pi),
             trail_length=trail_length,
             importance=importance,
             sustain=note_duration,
@@ -102,7 +143,6 @@ class ParticleSystem:
             has_trail=has_trail,
             trail_color=trail_color
         )
-        self.particles.append(particle)
     
     def _get_shape_type(self, frequency, importance):
         # Más variedad de formas basadas en características
@@ -116,175 +156,192 @@ class ParticleSystem:
             return 'circle'  # El resto son círculos
     
     def update(self, dt: float):
-        new_particles = []
-        for particle in self.particles:
+        p = self.particles
+        if len(p) > 0:
             # Factor de tiempo para movimientos
-            time_factor = (1 - particle.life) * 10
+            time_factor = (1 - p.life) * 10
+            important = p.importance > 0.7
             
             # Movimiento ondulatorio mejorado para sonidos sostenidos
-            wave_offset = particle.wave_amplitude * np.sin(
-                particle.wave_frequency * time_factor + particle.phase
-            )
+            wave_offset = p.wave_amplitude * np.sin(p.wave_frequency * time_factor + p.phase)
             
             # Movimiento más complejo para partículas importantes
-            if particle.importance > 0.7:
-                wave_offset *= (1 + np.cos(time_factor * 0.5) * 0.5)
-            
-            # Calcular nueva posición
-            new_x = particle.x + (particle.velocity[0] * dt) + (wave_offset * dt)
-            new_y = particle.y + particle.velocity[1] * dt
-            
-            # Actualizar velocidades con resistencia variable
-            resistance_x = 0.995 if particle.has_trail else 0.99
-            resistance_y = 0.998 if particle.has_trail else 0.995
-            
-            vx = particle.velocity[0] * resistance_x
-            vy = particle.velocity[1] * resistance_y
+            wave_offset = np.where(important, wave_offset * (1 + np.cos(time_factor * 0.5) * 0.5), wave_offset)
             
             # Efecto de "baile" mejorado
-            dance_factor = np.sin(time_factor * 2) * particle.wave_amplitude * 0.4
-            if particle.importance > 0.6:
-                dance_factor *= (1 + np.sin(time_factor * 0.7) * 0.3)
+            dance_factor = np.sin(time_factor * 2) * p.wave_amplitude * 0.4
+            dance_factor = np.where(p.importance > 0.6,
+                                    dance_factor * (1 + np.sin(time_factor * 0.7) * 0.3),
+                                    dance_factor)
+            
+            # Calcular nueva posición con la velocidad anterior
+            p.x += (p.vx + wave_offset + dance_factor) * dt
+            p.y += p.vy * dt
             
-            # Actualizar posición y velocidad
-            particle.x = new_x + dance_factor * dt
-            particle.y = new_y
-            particle.velocity = (vx, vy)
+            # Actualizar velocidades con resistencia variable
+            p.vx *= np.where(p.has_trail, 0.995, 0.99).astype(np.float32)
+            p.vy *= np.where(p.has_trail, 0.998, 0.995).astype(np.float32)
             
             # Rotación dinámica basada en importancia
-            rot_speed = 45 + abs(dance_factor)
-            if particle.importance > 0.7:
-                rot_speed *= 1.5
-            particle.rotation += dt * rot_speed
+            rot_speed = 45 + np.abs(dance_factor)
+            rot_speed = np.where(important, rot_speed * 1.5, rot_speed)
+            p.rotation += dt * rot_speed
             
-            # Desvanecer gradualmente
-            fade_factor = 1.0
-            if particle.y < self.height * 0.05:  # Desvanecer en el 5% superior
-                fade_factor = particle.y / (self.height * 0.05)
+            # Desvanecer gradualmente en el 5% superior
+            fade_zone = self.height * 0.05
+            fade_factor = np.where(p.y < fade_zone, p.y / fade_zone, 1.0)
             
             # Reducción de vida más lenta para partículas importantes
-            life_reduction = dt / particle.max_life
-            if particle.importance > 0.7:
-                life_reduction *= 0.7
-            
-            particle.life -= life_reduction * fade_factor
+            life_reduction = dt / p.max_life
+            life_reduction = np.where(important, life_reduction * 0.7, life_reduction)
+            p.life -= life_reduction * fade_factor
             
             # Mantener partículas dentro de los límites horizontales
-            particle.x = max(0, min(self.width, particle.x))
+            np.clip(p.x, 0, self.width, out=p.x)
             
             # Guardar historial para estelas si es necesario
-            if particle.has_trail:
-                self.trail_history.append({
-                    'x': particle.x,
-                    'y': particle.y,
-                    'color': particle.trail_color,
-                    'size': particle.size * 0.7,
-                    'life': particle.life,
-                    'alpha': 0.5
-                })
+            trailing = p.has_trail
+            self.trails.push(p.x[trailing], p.y[trailing], p.trail_color[trailing],
+                             p.size[trailing] * 0.7, p.life[trailing])
             
             # Mantener partículas con vida
-            if particle.life > 0 and particle.y >= 0:
-                new_particles.append(particle)
-        
-        self.particles = new_particles
+            p.compact((p.life > 0) & (p.y >= 0))
         
         # Actualizar y limpiar historial de estelas
-        self.trail_history = [trail for trail in self.trail_history if trail['life'] > 0.1]
-        for trail in self.trail_history:
-            trail['life'] -= dt * 0.5
-    
-    def draw(self, frame: np.ndarray):
-        # Dibujar primero las estelas
-        for trail in self.trail_history:
-            alpha = trail['alpha'] * trail['life']
-            color = tuple(int(c * alpha) for c in trail['color'])
-            size = int(trail['size'] * trail['life'])
-            cv2.circle(frame, (int(trail['x']), int(trail['y'])), size, color, -1)
-        
-        # Ordenar partículas por tamaño e importancia
-        sorted_particles = sorted(
-            self.particles,
-            key=lambda p: (p.importance, p.size),
-            reverse=True
-        )
+        self.trails.age(dt)
         
-        for particle in sorted_particles:
-            alpha = particle.life
-            size = int(particle.size * alpha)
-            color = tuple(int(c * alpha) for c in particle.color)
-            
-            # Aplicar efecto de brillo para partículas importantes
-            if particle.importance > 0.6 or size > 10:
-                self._apply_glow(frame, particle, color, size)
-            
-            # Dibujar la partícula según su forma
-            if particle.shape_type == 'circle':
-                cv2.circle(frame, (int(particle.x), int(particle.y)), size, color, -1)
-            elif particle.shape_type == 'square':
-                self._draw_rotated_rect(frame, particle, size, color)
-            elif particle.shape_type == 'star':
-                self._draw_star(frame, (int(particle.x), int(particle.y)), 
-                              size, color, particle.rotation)
-            elif particle.shape_type == 'triangle':
-                self._draw_triangle(frame, particle, size, color)
+        if self.lod is not None:
+            self.apply_lod(self.lod)
+    
+    def apply_lod(self, lod: LODSettings):
+        """Elimina partículas invisibles o fuera de presupuesto y recorta las estelas"""
+        if len(self.particles) > 0:
+            keep = select_particles(self.particles, lod)
+            if not keep.all():
+                self.particles.compact(keep)
+        if lod.max_trail_points is not None:
+            self.trails.trim(lod.max_trail_points)
     
-    def _draw_rotated_rect(self, frame, particle, size, color):
-        center = (int(particle.x), int(particle.y))
-        rect = ((particle.x, particle.y), (size*2, size*2), particle.rotation)
-        box = cv2.boxPoints(rect)
-        box = np.int0(box)
-        cv2.drawContours(frame, [box], 0, color, -1)
+    def get_state(self) -> dict:
+        """Estado completo de la simulación (partículas, estelas y generador aleatorio) como arrays"""
+        state = {f'p_{name}': values for name, values in self.particles.state().items()}
+        state.update({f't_{name}': values for name, values in self.trails.points().items()})
+        state['rng'] = np.array(json.dumps(self.rng.bit_generator.state))
+        return state
     
-    def _draw_triangle(self, frame, particle, size, color):
-        center = np.array([particle.x, particle.y])
-        angle = np.radians(particle.rotation)
-        points = []
-        for i in range(3):
-            point_angle = angle + i * (2*np.pi/3)
-            point = center + size * np.array([np.cos(point_angle), np.sin(point_angle)])
-            points.append(point)
-        points = np.array(points, dtype=np.int32)
-        cv2.fillPoly(frame, [points], color)
+    def set_state(self, state):
+        """Restaura un estado de `get_state` (admite el resultado de np.load)"""
+        self.particles.load_state({key[2:]: state[key] for key in state if key.startswith('p_')})
+        self.trails.load_points({key[2:]: state[key] for key in state if key.startswith('t_')})
+        self.rng.bit_generator.state = json.loads(str(state['rng']))
     
-    def _draw_star(self, frame, center, size, color, rotation):
-        """Dibuja una estrella con el tamaño y rotación especificados"""
-        num_points = 5  # Estrella de 5 puntas
-        outer_radius = size
-        inner_radius = size * 0.4  # Radio interno más pequeño para forma de estrella
-        points = []
+    def snapshot(self) -> dict:
+        """Copia del estado necesario para dibujar el frame actual (p. ej. en otro proceso)"""
+        p = self.particles
+        return {
+            'particles': {name: getattr(p, name).copy() for name in DRAW_FIELDS},
+            'trails': self.trails.points(),
+        }
+    
+    def prepare_draw(self, snapshot: dict = None, scale: Scale = 1.0) -> DrawBatch:
+        """Orden de dibujado, tamaños y colores de las partículas del frame actual (o de `snapshot`).
+
+        `scale` convierte posiciones y tamaños de la simulación a píxeles del
+        frame de destino (p. ej. 0.5 para dibujar a mitad de resolución, o
+        una tupla (x, y) para otra relación de aspecto).
+        """
+        scale_x, scale_y, scale_size = split_scale(scale)
+        if snapshot is None:
+            p = {name: getattr(self.particles, name) for name in DRAW_FIELDS}
+        else:
+            p = snapshot['particles']
         
-        # Calcular puntos de la estrella
-        for i in range(num_points * 2):
-            # Alternar entre radio externo e interno
-            current_radius = outer_radius if i % 2 == 0 else inner_radius
-            # Calcular ángulo con rotación
-            angle = (i * 2 * np.pi / (2 * num_points)) + np.radians(rotation)
-            
-            x = center[0] + current_radius * np.cos(angle)
-            y = center[1] + current_radius * np.sin(angle)
-            points.append([x, y])
+        # Ordenar partículas por importancia y tamaño (descendente, orden estable)
+        order = np.lexsort((-p['size'], -p['importance']))
         
-        # Convertir puntos a formato numpy y dibujar
-        points = np.array(points, dtype=np.int32)
-        cv2.fillPoly(frame, [points], color)
-    
-    def _apply_glow(self, frame, particle, color, size):
-        """Aplica un efecto de brillo alrededor de la partícula"""
-        glow_size = size * 2
-        glow_color = tuple(int(c * 0.5) for c in color)  # Color más tenue para el brillo
+        alphas = p['life'].astype(np.float64)
+        sizes = (p['size'] * alphas * scale_size).astype(np.int32)
+        colors = (p['color'] * alphas[:, None]).astype(np.int32)
         
-        # Crear máscara de brillo con desenfoque gaussiano
-        glow_mask = np.zeros((self.height, self.width), dtype=np.uint8)
-        cv2.circle(glow_mask, (int(particle.x), int(particle.y)), glow_size, 255, -1)
-        glow_mask = cv2.GaussianBlur(glow_mask, (21, 21), 0)
+        # Brillo para partículas importantes o grandes
+        glowing = (p['importance'] > 0.6) | (sizes > 10)
+        simple = None
+        lod = self.lod
+        if lod is not None:
+            # Con el nivel de detalle reducido, las menos importantes pierden brillo y forma
+            if lod.glow_importance > 0:
+                glowing &= p['importance'] >= lod.glow_importance
+            if lod.detail_importance > 0:
+                simple = p['importance'] < lod.detail_importance
+        return DrawBatch(
+            order=order,
+            xs=(p['x'] * scale_x).astype(np.int32),
+            ys=(p['y'] * scale_y).astype(np.int32),
+            sizes=sizes,
+            alphas=alphas,
+            colors=colors,
+            tints=colors.astype(np.float32),
+            shapes=p['shape'],
+            rotations=p['rotation'],
+            glowing=glowing,
+            simple=simple,
+        )
+    
+    @staticmethod
+    def mark_dirty(batch: DrawBatch, dirty):
+        """Marca en `dirty` (DirtyTiles) los tiles que tocarán brillos y formas"""
+        reach = np.where(batch.glowing,
+                         np.maximum(SpriteAtlas.extent(batch.sizes), GlowLayer.extent(batch.sizes * 2)),
+                         SpriteAtlas.extent(batch.sizes))
+        xs, ys = batch.xs, batch.ys
+        dirty.mark_boxes(xs - reach, ys - reach, xs + reach + 1, ys + reach + 1)
+    
+    def _glow_layer(self, frame: np.ndarray) -> GlowLayer:
+        """Capa de brillo del tamaño de `frame`"""
+        height, width = frame.shape[:2]
+        if (width, height) == (self.width, self.height):
+            return self.glow
+        glow = self._scaled_glows.get((width, height))
+        if glow is None:
+            glow = self._scaled_glows[width, height] = GlowLayer(width, height)
+        return glow
+    
+    def draw_trails(self, frame: np.ndarray, points: dict = None, dirty=None, scale: Scale = 1.0):
+        """Dibuja las estelas (o los puntos `points` de una instantánea) con el rasterizador"""
+        self.trails.draw(frame, points, dirty, scale, self.rasterizer)
+    
+    def draw_glow(self, frame: np.ndarray, batch: DrawBatch):
+        """Acumula el brillo de las partículas en una sola capa y la suma al frame"""
+        glow = self._glow_layer(frame)
+        order = batch.order
+        glowing = order[batch.glowing[order]]
+        self.rasterizer.draw_glows(
+            glow, batch.xs[glowing], batch.ys[glowing], batch.sizes[glowing] * 2,
+            (batch.colors[glowing] * 0.5).astype(np.int32),  # Color más tenue para el brillo
+            batch.alphas[glowing]
+        )
+        glow.composite(frame)
+    
+    def draw_shapes(self, frame: np.ndarray, batch: DrawBatch):
+        """Dibuja cada partícula como un sprite pre-rasterizado de su forma"""
+        self.rasterizer.draw_shapes(frame, self.sprites, batch)
+    
+    def draw(self, frame: np.ndarray, snapshot: dict = None, dirty=None, scale: Scale = 1.0):
+        """Dibuja estelas, brillos y partículas; si se pasa `dirty` (DirtyTiles) marca los tiles tocados.
+
+        Con `scale` distinto de 1 se dibuja en un frame de otro tamaño
+        (`scale` veces el de la simulación, o (escala x, escala y)).
+        """
+        timer = self.instrumentation
+        # Dibujar primero las estelas
+        with timer.stage('trails'):
+            self.draw_trails(frame, None if snapshot is None else snapshot['trails'], dirty, scale)
         
-        # Aplicar brillo al frame
-        for c in range(3):
-            frame[:, :, c] = cv2.addWeighted(
-                frame[:, :, c],
-                1.0,
-                glow_mask,
-                glow_color[c] / 255.0 * particle.life,
-                0
-            )
\ No newline at end of file
+        with timer.stage('draw'):
+            batch = self.prepare_draw(snapshot, scale)
+            if dirty is not None:
+                self.mark_dirty(batch, dirty)
+        with timer.stage('glow'):
+            self.draw_glow(frame, batch)
+        with timer.stage('draw'):
+            self.draw_shapes(frame, batch)
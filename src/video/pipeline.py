@@ -0,0 +1,80 @@
+import queue
+import threading
+from .compositor import FrameCompositor, TileCanvas
+
+class CompositeStage:
+    """Etapa de mezcla del pipeline de renderizado, en su propio hilo.
+
+    El hilo principal dibuja en uno de `depth` lienzos (`acquire`) y lo
+    entrega con `submit`; el hilo mezcla los lienzos en orden, escribe el
+    resultado en `out` y devuelve el lienzo a la reserva. Si no quedan
+    lienzos libres `acquire` espera, así que como mucho hay `depth` frames
+    en vuelo. OpenCV libera el GIL durante la mezcla y el desenfoque, de
+    modo que esto se solapa con el dibujado del frame siguiente.
+    """
+
+    def __init__(self, compositor: FrameCompositor, out, depth: int = 2):
+        self.compositor = compositor
+        self.out = out
+        self.depth = max(1, depth)
+        self._free = queue.Queue()
+        for _ in range(self.depth):
+            self._free.put(compositor.new_canvas())
+        self._pending = queue.Queue()
+        self._thread = None
+        self._error = None
+
+    def open(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            canvas, blend_factor = item
+            try:
+                if self._error is None:
+                    self.out.write(self.compositor.compose_canvas(canvas, blend_factor))
+            except Exception as e:
+                self._error = e
+            finally:
+                self._free.put(canvas)
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def acquire(self) -> TileCanvas:
+        """Lienzo libre para dibujar el siguiente frame (sin limpiar)"""
+        self._raise_error()
+        return self._free.get()
+
+    def submit(self, canvas: TileCanvas, blend_factor: float):
+        self._pending.put((canvas, blend_factor))
+
+    def _join(self):
+        if self._thread is not None:
+            self._pending.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        """Espera a que se mezclen todos los frames entregados"""
+        self._join()
+        self._raise_error()
+
+    def abort(self):
+        self._error = self._error or RuntimeError("Renderizado cancelado")
+        self._join()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,375 @@
+import numpy as np
+import cv2
+from abc import ABC, abstractmethod
+from typing import Dict, Tuple, Union
+from .glow import GlowLayer
+from .sprites import SpriteAtlas
+
+try:
+    import numba
+except ImportError:  # Numba es opcional: sin él no hay backend 'numba'
+    numba = None
+
+
+class DiscTable:
+    """Desplazamientos de los píxeles de los discos de radio 0..radius (igual que cv2.circle)"""
+
+    def __init__(self):
+        self.radius = -1
+        self.dy = self.dx = self.start = self.area = None
+
+    def ensure(self, radius: int):
+        if radius <= self.radius:
+            return
+        dys, dxs, areas = [], [], []
+        for r in range(radius + 1):
+            canvas = np.zeros((2 * r + 1, 2 * r + 1), dtype=np.uint8)
+            cv2.circle(canvas, (r, r), r, 1, -1)
+            dy, dx = np.nonzero(canvas)
+            dys.append(dy - r)
+            dxs.append(dx - r)
+            areas.append(len(dy))
+        self.dy = np.concatenate(dys).astype(np.int32)
+        self.dx = np.concatenate(dxs).astype(np.int32)
+        self.area = np.array(areas, dtype=np.int64)
+        self.start = np.concatenate([[0], np.cumsum(self.area)[:-1]]).astype(np.int64)
+        self.radius = radius
+
+
+class Rasterizer(ABC):
+    """Backend de dibujado de `ParticleSystem`.
+
+    Recibe los datos ya preparados de un frame (estelas, brillos y el
+    `DrawBatch` de las partículas) y los rasteriza. Todos los backends
+    dibujan lo mismo; cambian cómo: primitiva a primitiva, por lotes
+    vectorizados o en un kernel compilado.
+    """
+
+    name = ''
+
+    def __init__(self):
+        self.discs = DiscTable()
+
+    @abstractmethod
+    def draw_discs(self, frame: np.ndarray, xs: np.ndarray, ys: np.ndarray,
+                   radii: np.ndarray, colors: np.ndarray):
+        """Discos opacos sin antialiasing, en orden (los últimos quedan encima)"""
+
+    def draw_glows(self, glow: GlowLayer, xs: np.ndarray, ys: np.ndarray, radii: np.ndarray,
+                   colors: np.ndarray, strengths: np.ndarray):
+        """Acumula brillos en `glow` (el orden no importa: es una suma).
+
+        Por defecto, un sprite desenfocado por brillo sumado en su ROI: ya
+        es aritmética de NumPy sobre bloques grandes y, con pocos brillos
+        por frame, más rápido que juntar todos los píxeles en un lote.
+        """
+        for x, y, radius, color, strength in zip(xs.tolist(), ys.tolist(), radii.tolist(),
+                                                 colors.tolist(), strengths):
+            glow.add(x, y, radius, color, strength)
+
+    @abstractmethod
+    def draw_shapes(self, frame: np.ndarray, atlas: SpriteAtlas, batch):
+        """Partículas del `DrawBatch` en `batch.order`: sprites con AA o, si `batch.simple`, discos"""
+
+
+class OpenCVRasterizer(Rasterizer):
+    """Una llamada por primitiva (cv2.circle, sprites por ROI); los discos pequeños, por lotes"""
+
+    name = 'opencv'
+    BATCH = 4096           # Puntos por lote al rasterizar discos
+    SCATTER_MAX_AREA = 40  # Área media máxima (px) para la escritura vectorizada
+
+    def draw_discs(self, frame, xs, ys, radii, colors):
+        if len(radii) == 0:
+            return
+        self.discs.ensure(int(radii.max()))
+        areas = self.discs.area[radii]
+        # Discos pequeños: escritura vectorizada de píxeles; grandes: cv2.circle.
+        # Cada lote respeta el orden, así que los puntos recientes quedan encima.
+        for lo in range(0, len(radii), self.BATCH):
+            batch = slice(lo, lo + self.BATCH)
+            if areas[batch].mean() <= self.SCATTER_MAX_AREA:
+                scatter_discs(frame, self.discs, xs[batch], ys[batch], radii[batch], colors[batch])
+            else:
+                circle = cv2.circle
+                for x, y, r, color in zip(xs[batch].tolist(), ys[batch].tolist(),
+                                          radii[batch].tolist(), colors[batch].tolist()):
+                    circle(frame, (x, y), r, color, -1)
+
+    def draw_shapes(self, frame, atlas, batch):
+        if batch.simple is None:
+            for i in batch.order:
+                sprite = atlas.get(int(batch.shapes[i]), int(batch.sizes[i]), float(batch.rotations[i]))
+                atlas.blit(frame, int(batch.xs[i]), int(batch.ys[i]), sprite, batch.tints[i])
+            return
+        # Con LOD, las partículas marcadas en `batch.simple` son círculos sin AA
+        circle = cv2.circle
+        simple = batch.simple.tolist()
+        colors = batch.colors.tolist()
+        for i in batch.order.tolist():
+            if simple[i]:
+                circle(frame, (int(batch.xs[i]), int(batch.ys[i])), max(0, int(batch.sizes[i])), colors[i], -1)
+            else:
+                sprite = atlas.get(int(batch.shapes[i]), int(batch.sizes[i]), float(batch.rotations[i]))
+                atlas.blit(frame, int(batch.xs[i]), int(batch.ys[i]), sprite, batch.tints[i])
+
+
+def scatter_discs(frame: np.ndarray, discs: DiscTable, xs, ys, radii, colors):
+    """Escribe de una vez todos los píxeles de los discos (los repetidos se quedan con el último)"""
+    height, width = frame.shape[:2]
+    areas = discs.area[radii]
+    total = int(areas.sum())
+    # Índice dentro de la tabla de discos de cada píxel del lote
+    first = discs.start[radii] - (np.cumsum(areas) - areas)
+    offset = np.repeat(first, areas) + np.arange(total)
+    py = np.repeat(ys, areas) + discs.dy[offset]
+    px = np.repeat(xs, areas) + discs.dx[offset]
+    inside = (py >= 0) & (py < height) & (px >= 0) & (px < width)
+    frame[py[inside], px[inside]] = np.repeat(colors, areas, axis=0)[inside]
+
+
+def _pack(masks) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Inicio, semiancho y coberturas en un array plano de varias máscaras cuadradas"""
+    half = np.array([mask.shape[0] // 2 for mask in masks], dtype=np.int64)
+    start = np.concatenate([[0], np.cumsum([mask.size for mask in masks])[:-1]]).astype(np.int64)
+    coverage = np.concatenate([mask.ravel() for mask in masks]).astype(np.float32)
+    return start, half, coverage
+
+
+class _SpriteSet:
+    """Los sprites distintos de un frame empaquetados en arrays planos, y cuál usa cada partícula"""
+
+    def __init__(self, atlas: SpriteAtlas, discs: DiscTable, batch):
+        order = batch.order
+        keys = atlas.keys(batch.shapes[order], batch.sizes[order], batch.rotations[order])
+        if batch.simple is not None:
+            # Los círculos simples usan el disco sin AA (forma -1) de cobertura completa
+            keys[batch.simple[order], 0] = -1
+            keys[batch.simple[order], 2] = 0
+        unique, self.index = np.unique(keys, axis=0, return_inverse=True)
+        self.index = self.index.reshape(-1)
+
+        masks = []
+        for shape, size, steps in unique.tolist():
+            if shape < 0:
+                discs.ensure(size)
+                mask = np.zeros((2 * size + 1, 2 * size + 1), dtype=np.float32)
+                start, area = discs.start[size], discs.area[size]
+                mask[discs.dy[start:start + area] + size, discs.dx[start:start + area] + size] = 1.0
+            else:
+                mask = atlas.lookup((shape, size, steps))[:, :, 0]
+            masks.append(mask)
+        self.start, self.half, self.coverage = _pack(masks)
+        self.masks = masks
+
+
+class NumpyRasterizer(Rasterizer):
+    """Discos y formas por lotes vectorizados, sin bucles de Python por primitiva.
+
+    Compensa con muchas partículas pequeñas, donde manda el coste de cada
+    llamada; con pocas y grandes es más lento que OpenCV. Las formas se
+    componen con la fórmula cerrada de la mezcla alfa en orden: los píxeles
+    de todos los sprites se agrupan por posición y el resultado de cada
+    grupo es el fondo por la transmitancia total más la suma de cada color
+    por su cobertura y la transmitancia de lo que va encima. Coincide con
+    el dibujado secuencial salvo por el redondeo intermedio a 8 bits (un
+    nivel como mucho donde hay solapes).
+    """
+
+    name = 'numpy'
+    BATCH = 4096  # Discos por lote (acota la memoria temporal)
+
+    def draw_discs(self, frame, xs, ys, radii, colors):
+        if len(radii) == 0:
+            return
+        self.discs.ensure(int(radii.max()))
+        for lo in range(0, len(radii), self.BATCH):
+            batch = slice(lo, lo + self.BATCH)
+            scatter_discs(frame, self.discs, xs[batch], ys[batch], radii[batch], colors[batch])
+
+    def draw_shapes(self, frame, atlas, batch):
+        order = batch.order
+        if len(order) == 0:
+            return
+        height, width = frame.shape[:2]
+        sprites = _SpriteSet(atlas, self.discs, batch)
+
+        # Píxeles con cobertura de cada sprite distinto, repetidos por partícula
+        offsets = [np.flatnonzero(mask.ravel()) for mask in sprites.masks]
+        widths = [mask.shape[1] for mask in sprites.masks]
+        counts = np.array([len(o) for o in offsets], dtype=np.int64)[sprites.index]
+        flat = np.concatenate(offsets)
+        flat_start = np.concatenate([[0], np.cumsum([len(o) for o in offsets])[:-1]]).astype(np.int64)
+        first = flat_start[sprites.index] - (np.cumsum(counts) - counts)
+        local = flat[np.repeat(first, counts) + np.arange(int(counts.sum()))]
+        mask_width = np.repeat(np.array(widths, dtype=np.int64)[sprites.index], counts)
+        half = np.repeat(sprites.half[sprites.index], counts)
+        coverage = sprites.coverage[np.repeat(sprites.start[sprites.index], counts) + local]
+        py = np.repeat(batch.ys[order].astype(np.int64), counts) + local // mask_width - half
+        px = np.repeat(batch.xs[order].astype(np.int64), counts) + local % mask_width - half
+        rank = np.repeat(np.arange(len(order)), counts)
+        inside = (py >= 0) & (py < height) & (px >= 0) & (px < width)
+        pixels = (py * width + px)[inside]
+        coverage, rank = coverage[inside].astype(np.float64), rank[inside]
+        if len(pixels) == 0:
+            return
+
+        # Agrupar por píxel conservando el orden de dibujado dentro de cada grupo
+        by_pixel = np.argsort(pixels, kind='stable')
+        pixels, coverage, rank = pixels[by_pixel], coverage[by_pixel], rank[by_pixel]
+        starts = np.flatnonzero(np.r_[True, pixels[1:] != pixels[:-1]])
+        group = np.cumsum(np.r_[True, pixels[1:] != pixels[:-1]]) - 1
+
+        # Transmitancia de lo que se dibuja encima de cada píxel: prod(1 - a) posterior
+        log_clear = np.log1p(-np.minimum(coverage, 1 - 1e-12))
+        cumulative = np.cumsum(log_clear)
+        ends = np.r_[starts[1:], len(pixels)] - 1
+        above = np.exp(cumulative[ends][group] - cumulative)
+        before = np.r_[0.0, cumulative][starts]
+        behind = np.exp(cumulative[ends] - before)
+
+        colors = np.where(batch.simple[order, None], batch.colors[order], batch.tints[order]) \
+            if batch.simple is not None else batch.tints[order]
+        contribution = (coverage * above)[:, None] * colors[rank].astype(np.float64)
+        # `frame` puede ser una vista recortada: indexar por (fila, columna)
+        ty, tx = np.divmod(pixels[starts], width)
+        result = frame[ty, tx] * behind[:, None] + np.add.reduceat(contribution, starts, axis=0)
+        frame[ty, tx] = np.clip(np.floor(result + 0.5), 0, 255).astype(np.uint8)
+
+
+if numba is not None:
+    @numba.njit(cache=True, nogil=True)
+    def _discs_kernel(frame, xs, ys, radii, colors, disc_dy, disc_dx, disc_start, disc_area):
+        height, width = frame.shape[0], frame.shape[1]
+        for i in range(len(xs)):
+            r = radii[i]
+            s = disc_start[r]
+            for k in range(s, s + disc_area[r]):
+                y = ys[i] + disc_dy[k]
+                x = xs[i] + disc_dx[k]
+                if 0 <= y < height and 0 <= x < width:
+                    frame[y, x, 0] = colors[i, 0]
+                    frame[y, x, 1] = colors[i, 1]
+                    frame[y, x, 2] = colors[i, 2]
+
+    @numba.njit(cache=True, nogil=True)
+    def _glows_kernel(layer, xs, ys, sprite_index, sprite_start, sprite_half, coverage, weights):
+        height, width = layer.shape[0], layer.shape[1]
+        for i in range(len(xs)):
+            j = sprite_index[i]
+            half = sprite_half[j]
+            size = 2 * half + 1
+            base = sprite_start[j]
+            for sy in range(size):
+                y = ys[i] + sy - half
+                if y < 0 or y >= height:
+                    continue
+                for sx in range(size):
+                    x = xs[i] + sx - half
+                    if x < 0 or x >= width:
+                        continue
+                    # Misma aritmética que GlowLayer.add: producto en float64 y suma a float32
+                    cov = np.float64(coverage[base + sy * size + sx])
+                    for c in range(3):
+                        layer[y, x, c] = np.float32(np.float64(layer[y, x, c]) + cov * weights[i, c])
+
+    @numba.njit(cache=True, nogil=True)
+    def _shapes_kernel(frame, xs, ys, sprite_index, sprite_start, sprite_half, coverage,
+                       tints, colors, simple):
+        height, width = frame.shape[0], frame.shape[1]
+        half_level = np.float32(0.5)
+        for i in range(len(xs)):
+            j = sprite_index[i]
+            half = sprite_half[j]
+            size = 2 * half + 1
+            base = sprite_start[j]
+            for sy in range(size):
+                y = ys[i] + sy - half
+                if y < 0 or y >= height:
+                    continue
+                for sx in range(size):
+                    x = xs[i] + sx - half
+                    if x < 0 or x >= width:
+                        continue
+                    cov = coverage[base + sy * size + sx]
+                    if cov == 0:
+                        continue
+                    if simple[i]:
+                        for c in range(3):
+                            frame[y, x, c] = colors[i, c]
+                    else:
+                        # Misma aritmética que SpriteAtlas.blit, en float32
+                        for c in range(3):
+                            roi = np.float32(frame[y, x, c])
+                            frame[y, x, c] = np.uint8(roi + (tints[i, c] - roi) * cov + half_level)
+
+
+class NumbaRasterizer(Rasterizer):
+    """Cada tipo de primitiva en un solo kernel compilado con Numba.
+
+    Reproduce la aritmética de OpenCVRasterizer, así que la salida es la
+    misma; la primera llamada compila los kernels (se guardan en caché).
+    """
+
+    name = 'numba'
+
+    def __init__(self):
+        if numba is None:
+            raise RuntimeError("El backend 'numba' necesita el paquete numba")
+        super().__init__()
+
+    def draw_discs(self, frame, xs, ys, radii, colors):
+        if len(radii) == 0:
+            return
+        radii = np.maximum(radii, 0).astype(np.int64)
+        self.discs.ensure(int(radii.max()))
+        _discs_kernel(frame, xs.astype(np.int64), ys.astype(np.int64), radii,
+                      np.ascontiguousarray(colors, dtype=np.uint8),
+                      self.discs.dy, self.discs.dx, self.discs.start, self.discs.area)
+
+    def draw_glows(self, glow, xs, ys, radii, colors, strengths):
+        if len(xs) == 0:
+            return
+        radii = np.maximum(radii, 0)
+        unique, index = np.unique(radii, return_inverse=True)
+        sprites = [glow.sprite(int(radius))[:, :, 0] for radius in unique]
+        start, half, coverage = _pack(sprites)
+        weights = colors.astype(np.float32).astype(np.float64) \
+            * (np.asarray(strengths, dtype=np.float64) / 255.0)[:, None]
+        xs, ys = xs.astype(np.int64), ys.astype(np.int64)
+        _glows_kernel(glow.layer, xs, ys, index.reshape(-1).astype(np.int64), start, half, coverage, weights)
+        reach = half[index.reshape(-1)]
+        x0, y0 = max(0, int((xs - reach).min())), max(0, int((ys - reach).min()))
+        x1, y1 = min(glow.width, int((xs + reach).max()) + 1), min(glow.height, int((ys + reach).max()) + 1)
+        if x0 < x1 and y0 < y1:
+            glow.mark(x0, y0, x1, y1)
+
+    def draw_shapes(self, frame, atlas, batch):
+        order = batch.order
+        if len(order) == 0:
+            return
+        sprites = _SpriteSet(atlas, self.discs, batch)
+        simple = batch.simple[order] if batch.simple is not None else np.zeros(len(order), dtype=np.bool_)
+        _shapes_kernel(frame, batch.xs[order].astype(np.int64), batch.ys[order].astype(np.int64),
+                       sprites.index.astype(np.int64), sprites.start, sprites.half, sprites.coverage,
+                       np.ascontiguousarray(batch.tints[order], dtype=np.float32),
+                       np.clip(batch.colors[order], 0, 255).astype(np.uint8), simple)
+
+
+RASTERIZERS: Dict[str, type] = {
+    'opencv': OpenCVRasterizer,
+    'numpy': NumpyRasterizer,
+    'numba': NumbaRasterizer,
+}
+
+def available_rasterizers() -> list:
+    """Backends que se pueden usar en esta instalación"""
+    return [name for name in RASTERIZERS if name != 'numba' or numba is not None]
+
+def create_rasterizer(rasterizer: Union[str, Rasterizer] = 'opencv') -> Rasterizer:
+    """Crea el backend pedido por nombre (o devuelve el que se pasa ya creado)"""
+    if isinstance(rasterizer, Rasterizer):
+        return rasterizer
+    if rasterizer not in RASTERIZERS:
+        raise ValueError(f"Rasterizador desconocido: {rasterizer}")
+    return RASTERIZERS[rasterizer]()
@@ -0,0 +1,122 @@
+import numpy as np
+import cv2
+from collections import OrderedDict
+from typing import Tuple
+from .particle_store import SHAPE_CODES
+
+# Simetría rotacional de cada forma en grados (el círculo no depende de la rotación)
+_SYMMETRY = {
+    SHAPE_CODES['circle']: 0,
+    SHAPE_CODES['square']: 90,
+    SHAPE_CODES['star']: 72,
+    SHAPE_CODES['triangle']: 120,
+}
+
+_SUBPIXEL_BITS = 4  # Precisión subpíxel para fillPoly
+
+
+def _shape_points(shape: int, size: int, rotation: float, center: float) -> np.ndarray:
+    """Vértices de la forma centrada en (center, center)"""
+    angle = np.radians(rotation)
+    if shape == SHAPE_CODES['square']:
+        # Cuadrado de lado 2*size girado `rotation` grados (como cv2.boxPoints)
+        corners = np.arange(4) * (np.pi / 2) + np.pi / 4 + angle
+        radii = np.full(4, size * np.sqrt(2))
+    elif shape == SHAPE_CODES['triangle']:
+        corners = angle + np.arange(3) * (2 * np.pi / 3)
+        radii = np.full(3, float(size))
+    else:
+        # Estrella de 5 puntas alternando radio externo e interno
+        corners = np.arange(10) * (2 * np.pi / 10) + angle
+        radii = np.where(np.arange(10) % 2 == 0, size, size * 0.4)
+    points = np.stack([center + radii * np.cos(corners),
+                       center + radii * np.sin(corners)], axis=1)
+    return np.round(points * (1 << _SUBPIXEL_BITS)).astype(np.int32)
+
+
+class SpriteAtlas:
+    """Caché LRU de formas pre-rasterizadas con antialiasing.
+
+    Cada sprite es una máscara de cobertura en [0, 1] indexada por forma,
+    tamaño y rotación cuantizada; dibujar una partícula se reduce a mezclar
+    el color de la partícula dentro de la ROI del sprite.
+    """
+
+    def __init__(self, max_entries: int = 1024, rotation_step: float = 5.0):
+        self.max_entries = max_entries
+        self.rotation_step = rotation_step
+        self._cache: OrderedDict = OrderedDict()
+
+    def _key(self, shape: int, size: int, rotation: float) -> Tuple[int, int, int]:
+        symmetry = _SYMMETRY[shape]
+        if symmetry == 0:
+            return shape, size, 0
+        steps = int(round((rotation % symmetry) / self.rotation_step))
+        steps %= max(1, int(round(symmetry / self.rotation_step)))
+        return shape, size, steps
+
+    @staticmethod
+    def extent(size):
+        """Radio (en píxeles) del sprite de una forma de tamaño `size`; admite arrays"""
+        return np.ceil(np.maximum(size, 0) * 1.5).astype(np.int32) + 2
+
+    def _render(self, shape: int, size: int, steps: int) -> np.ndarray:
+        half = int(self.extent(size))
+        canvas = np.zeros((2 * half + 1, 2 * half + 1), dtype=np.uint8)
+        if shape == SHAPE_CODES['circle']:
+            cv2.circle(canvas, (half, half), size, 255, -1, cv2.LINE_AA)
+        else:
+            points = _shape_points(shape, size, steps * self.rotation_step, half)
+            cv2.fillPoly(canvas, [points], 255, cv2.LINE_AA, _SUBPIXEL_BITS)
+        return (canvas.astype(np.float32) / 255.0)[:, :, None]
+
+    def keys(self, shapes: np.ndarray, sizes: np.ndarray, rotations: np.ndarray) -> np.ndarray:
+        """Claves (forma, tamaño, paso de rotación) de muchas partículas a la vez, como `_key`"""
+        shapes = np.asarray(shapes, dtype=np.int64)
+        sizes = np.maximum(np.asarray(sizes, dtype=np.int64), 0)
+        symmetry = np.zeros(shapes.shape, dtype=np.float64)
+        for shape, degrees in _SYMMETRY.items():
+            symmetry[shapes == shape] = degrees
+        rotational = symmetry > 0
+        safe = np.where(rotational, symmetry, 1.0)
+        steps = np.rint(np.mod(rotations, safe) / self.rotation_step).astype(np.int64)
+        steps %= np.maximum(1, np.rint(safe / self.rotation_step).astype(np.int64))
+        return np.stack([shapes, sizes, np.where(rotational, steps, 0)], axis=1)
+
+    def get(self, shape: int, size: int, rotation: float) -> np.ndarray:
+        """Devuelve la máscara (alto, ancho, 1) del sprite, renderizándola si hace falta"""
+        return self.lookup(self._key(shape, max(0, size), rotation))
+
+    def lookup(self, key: Tuple[int, int, int]) -> np.ndarray:
+        """Como `get`, a partir de una clave de `keys`"""
+        sprite = self._cache.get(key)
+        if sprite is not None:
+            self._cache.move_to_end(key)
+            return sprite
+        sprite = self._render(*key)
+        self._cache[key] = sprite
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return sprite
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @staticmethod
+    def blit(frame: np.ndarray, x: int, y: int, sprite: np.ndarray,
+             color: Tuple[int, int, int], alpha: float = 1.0):
+        """Mezcla el sprite teñido con `color` en el frame, centrado en (x, y)"""
+        height, width = frame.shape[:2]
+        half = sprite.shape[0] // 2
+        x0, y0 = max(0, x - half), max(0, y - half)
+        x1, y1 = min(width, x + half + 1), min(height, y + half + 1)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        sx, sy = x0 - (x - half), y0 - (y - half)
+        coverage = sprite[sy:sy + (y1 - y0), sx:sx + (x1 - x0)]
+        if alpha != 1.0:
+            coverage = coverage * alpha
+        roi = frame[y0:y1, x0:x1]
+        tint = np.asarray(color, dtype=np.float32)
+        roi[...] = roi + (tint - roi) * coverage + 0.5
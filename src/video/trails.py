@@ -0,0 +1,134 @@
+import numpy as np
+from typing import Tuple, Union
+from .raster import OpenCVRasterizer, Rasterizer
+
+Scale = Union[float, Tuple[float, float]]
+
+def split_scale(scale: Scale) -> Tuple[float, float, float]:
+    """Escalas (x, y, tamaño) de un `scale` uniforme o por ejes.
+
+    Con escalas distintas por eje (otra relación de aspecto) los tamaños
+    usan su media geométrica, para que las formas sigan siendo redondas.
+    """
+    if isinstance(scale, tuple):
+        scale_x, scale_y = scale
+        return scale_x, scale_y, float(np.sqrt(scale_x * scale_y))
+    return scale, scale, scale
+
+
+class TrailBuffer:
+    """Buffer circular de capacidad fija para los puntos de las estelas.
+
+    Los puntos se guardan en orden cronológico en arrays contiguos. Cuando
+    el buffer está lleno se sobrescriben los más antiguos, de modo que la
+    memoria queda acotada por `capacity`.
+    """
+
+    ALPHA = 0.5        # Transparencia base de las estelas
+    MIN_LIFE = 0.1     # Por debajo de esta vida el punto se descarta
+    DECAY = 0.5        # Vida perdida por segundo
+
+    def __init__(self, capacity: int = 200_000):
+        self.capacity = max(1, capacity)
+        self.x = np.zeros(self.capacity, dtype=np.float32)
+        self.y = np.zeros(self.capacity, dtype=np.float32)
+        self.size = np.zeros(self.capacity, dtype=np.float32)
+        self.life = np.zeros(self.capacity, dtype=np.float32)
+        self.color = np.zeros((self.capacity, 3), dtype=np.uint8)
+        self.start = 0
+        self.count = 0
+        self._rasterizer = OpenCVRasterizer()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _window(self) -> np.ndarray:
+        """Índices de los puntos activos, del más antiguo al más reciente"""
+        return (self.start + np.arange(self.count)) % self.capacity
+
+    def push(self, x, y, color, size, life):
+        """Añade puntos de estela (arrays de igual longitud) al final del buffer"""
+        n = len(x)
+        if n == 0:
+            return
+        if n > self.capacity:
+            x, y, color, size, life = (a[-self.capacity:] for a in (x, y, color, size, life))
+            n = self.capacity
+
+        # Descartar los más antiguos si no hay sitio
+        overflow = self.count + n - self.capacity
+        if overflow > 0:
+            self.start = (self.start + overflow) % self.capacity
+            self.count -= overflow
+
+        idx = (self.start + self.count + np.arange(n)) % self.capacity
+        self.x[idx] = x
+        self.y[idx] = y
+        self.color[idx] = color
+        self.size[idx] = size
+        self.life[idx] = life
+        self.count += n
+
+    def age(self, dt: float):
+        """Descarta los puntos agotados y envejece el resto"""
+        if self.count == 0:
+            return
+        idx = self._window()
+        life = self.life[idx]
+        alive = life > self.MIN_LIFE
+        kept = int(np.count_nonzero(alive))
+        if kept < self.count:
+            # Compactar conservando el orden cronológico
+            idx_alive = idx[alive]
+            self.start = 0
+            self.count = kept
+            for arr in (self.x, self.y, self.size, self.color):
+                arr[:kept] = arr[idx_alive]
+            self.life[:kept] = life[alive]
+            idx = np.arange(kept)
+        self.life[idx] -= dt * self.DECAY
+
+    def trim(self, max_points: int):
+        """Descarta los puntos más antiguos hasta dejar como mucho `max_points`"""
+        excess = self.count - max(0, max_points)
+        if excess > 0:
+            self.start = (self.start + excess) % self.capacity
+            self.count -= excess
+
+    def clear(self):
+        self.start = 0
+        self.count = 0
+
+    def load_points(self, points: dict):
+        """Sustituye los puntos por los de `points` (como los devuelve `points()`)"""
+        self.clear()
+        self.push(points['x'], points['y'], points['color'], points['size'], points['life'])
+
+    def points(self) -> dict:
+        """Copia de los puntos activos en orden cronológico"""
+        idx = self._window()
+        return {'x': self.x[idx], 'y': self.y[idx], 'size': self.size[idx],
+                'life': self.life[idx], 'color': self.color[idx]}
+
+    def draw(self, frame: np.ndarray, points: dict = None, dirty=None, scale: Scale = 1.0,
+             rasterizer: Rasterizer = None):
+        """Rasteriza todos los puntos (o los de `points`) en orden cronológico.
+
+        Si se pasa `dirty` (DirtyTiles) se marcan los tiles tocados; `scale`
+        (uniforme o por ejes) convierte las coordenadas de la simulación a
+        píxeles de `frame`. Los discos los dibuja `rasterizer` (por defecto
+        el de OpenCV).
+        """
+        if points is None:
+            points = self.points()
+        if len(points['x']) == 0:
+            return
+        scale_x, scale_y, scale_size = split_scale(scale)
+        life = points['life'].astype(np.float64)
+        radii = np.maximum((points['size'] * life * scale_size).astype(np.int64), 0)
+        colors = (points['color'] * (self.ALPHA * life)[:, None]).astype(np.uint8)
+        xs = (points['x'] * scale_x).astype(np.int64)
+        ys = (points['y'] * scale_y).astype(np.int64)
+        if dirty is not None:
+            dirty.mark_boxes(xs - radii, ys - radii, xs + radii + 1, ys + radii + 1)
+        (rasterizer or self._rasterizer).draw_discs(frame, xs, ys, radii, colors)
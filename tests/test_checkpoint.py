@@ -0,0 +1,82 @@
+import glob
+import os
+import subprocess
+import numpy as np
+import pytest
+from benchmarks.fixtures import make_fixture
+from src.audio.processor import AudioProcessor
+from src.video.checkpoint import CheckpointStore
+from src.video.encoder import find_ffmpeg
+from src.video.generator import VideoGenerator
+
+pytestmark = pytest.mark.skipif(not find_ffmpeg(), reason="necesita ffmpeg")
+
+WIDTH, HEIGHT, FPS = 160, 90, 30
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture(scope='module')
+def features(tmp_path_factory):
+    audio_path = make_fixture('beats', str(tmp_path_factory.mktemp('audio')), duration=3.0)
+    return AudioProcessor(audio_path).process_audio()
+
+
+def _render(features, output_path, checkpoint_dir, interval=10, start_time=None, end_time=None,
+            stop_after=None):
+    """Renderiza con checkpoints; con `stop_after` se interrumpe tras ese número de frames"""
+    generator = VideoGenerator(WIDTH, HEIGHT, FPS, encoder='ffmpeg', preset='ultrafast', seed=1)
+
+    def frame_callback(done, total):
+        if stop_after is not None and done >= stop_after:
+            raise Interrupted()
+
+    generator.generate_video(features, output_path, lambda progress, status: None,
+                             start_time=start_time, end_time=end_time,
+                             checkpoints=CheckpointStore(checkpoint_dir, interval),
+                             frame_callback=frame_callback)
+
+
+def _frames(path) -> np.ndarray:
+    raw = subprocess.run([find_ffmpeg(), '-v', 'error', '-i', path, '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-'],
+                         check=True, capture_output=True).stdout
+    return np.frombuffer(raw, dtype=np.uint8).reshape(-1, HEIGHT, WIDTH, 3)
+
+
+def _checkpoint_frames(directory):
+    return [int(os.path.splitext(name)[0].rsplit('_', 1)[1])
+            for name in os.listdir(directory) if name.endswith('.npz')]
+
+
+def test_range_from_seek_checkpoint_matches_straight_render(features, tmp_path):
+    straight = str(tmp_path / 'straight.mp4')
+    _render(features, straight, str(tmp_path / 'fresh'), start_time=1.8, end_time=2.4)
+
+    # La primera pasada deja checkpoints del avance rápido; la segunda parte de uno de ellos
+    shared = str(tmp_path / 'shared')
+    first, second = str(tmp_path / 'first.mp4'), str(tmp_path / 'second.mp4')
+    _render(features, first, shared, start_time=1.8, end_time=2.4)
+    assert any(frame < 54 for frame in _checkpoint_frames(shared))
+    _render(features, second, shared, start_time=1.8, end_time=2.4)
+
+    expected = _frames(straight)
+    assert np.array_equal(_frames(first), expected)
+    assert np.array_equal(_frames(second), expected)
+
+
+def test_resumed_render_matches_uninterrupted(features, tmp_path):
+    full = str(tmp_path / 'full.mp4')
+    _render(features, full, str(tmp_path / 'full_checkpoints'))
+
+    resumed = str(tmp_path / 'resumed.mp4')
+    checkpoint_dir = str(tmp_path / 'resumed_checkpoints')
+    with pytest.raises(Interrupted):
+        _render(features, resumed, checkpoint_dir, stop_after=45)
+    assert glob.glob(os.path.join(checkpoint_dir, '*_segments_*', '*[0-9].mp4'))
+    _render(features, resumed, checkpoint_dir)
+
+    with open(full, 'rb') as a, open(resumed, 'rb') as b:
+        assert a.read() == b.read()
+
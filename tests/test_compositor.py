@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from benchmarks.fixtures import make_fixture
+from src.audio.processor import AudioProcessor
+from src.video.compositor import FrameCompositor
+from src.video.control import ControlTrack
+from src.video.generator import VideoGenerator
+
+# Tamaño que no es múltiplo de los tiles, para cubrir también los bordes
+WIDTH, HEIGHT, FPS = 200, 120, 30
+
+
+@pytest.mark.parametrize('fixture', ['beats', 'dense'])
+def test_dirty_tiles_match_full_frame(fixture, tmp_path):
+    features = AudioProcessor(make_fixture(fixture, str(tmp_path), duration=2.0)).process_audio()
+    track = ControlTrack.from_features(features, FPS)
+    generator = VideoGenerator(WIDTH, HEIGHT, FPS, seed=3)
+    system = generator.particle_system
+
+    tiled = FrameCompositor(WIDTH, HEIGHT, tile_size=64)
+    # Con un fondo (aunque sea negro) el compositor procesa siempre el frame completo
+    full = FrameCompositor(WIDTH, HEIGHT, background=np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8))
+    assert tiled.tiled and not full.tiled
+
+    for frame_num in generator._simulate(track):
+        blend_factor = float(track[frame_num]['blend_factor'])
+        canvas = tiled.canvas()
+        system.draw(canvas, dirty=tiled.dirty)
+        expected_canvas = full.canvas()
+        np.copyto(expected_canvas, canvas)
+        assert np.array_equal(tiled.compose(canvas, blend_factor), full.compose(expected_canvas, blend_factor)), \
+            f"frame {frame_num}"
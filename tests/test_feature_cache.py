@@ -0,0 +1,39 @@
+import os
+import numpy as np
+from benchmarks.fixtures import make_fixture
+from src.audio.cache import FeatureCache
+from src.audio.processor import AudioProcessor
+
+
+def _files(cache_dir):
+    return {name: os.stat(os.path.join(cache_dir, name)).st_ino
+            for name in os.listdir(cache_dir) if name.endswith('.npz')}
+
+
+def test_each_feature_is_written_once(tmp_path):
+    audio_path = make_fixture('beats', str(tmp_path), duration=2.0)
+    cache_dir = str(tmp_path / 'cache')
+    features = AudioProcessor(audio_path, cache=FeatureCache(cache_dir)).process_audio()
+
+    features['rms']
+    before = _files(cache_dir)
+    assert len(before) == 1
+    features['spectral_centroids']
+    features['tempo']
+    after = _files(cache_dir)
+    # Calcular otras características no reescribe las que ya estaban
+    assert len(after) == 1 + 3  # centroide, tempo y beat_frames
+    assert all(after[name] == inode for name, inode in before.items())
+
+
+def test_cached_features_round_trip(tmp_path):
+    audio_path = make_fixture('dense', str(tmp_path), duration=2.0)
+    cache = FeatureCache(str(tmp_path / 'cache'))
+    computed = AudioProcessor(audio_path, cache=cache).process_audio()
+    expected = {name: computed[name] for name in computed}
+
+    loaded = AudioProcessor(audio_path, cache=cache).process_audio()
+    assert set(loaded.computed()) == set(expected) - {'audio_path'}
+    for name, value in expected.items():
+        assert np.array_equal(loaded[name], value), name
+    assert loaded._y is None  # Todo salió de la caché, sin decodificar el audio
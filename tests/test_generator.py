@@ -0,0 +1,56 @@
+import threading
+import pytest
+from benchmarks.fixtures import make_fixture
+from src.audio.processor import AudioProcessor
+from src.video.encoder import find_ffmpeg
+from src.video.generator import VideoGenerator
+from src.video.instrument import Instrumentation
+
+pytestmark = pytest.mark.skipif(not find_ffmpeg(), reason="necesita ffmpeg")
+
+
+def _render(audio_path, output_path, workers):
+    features = AudioProcessor(audio_path).process_audio()
+    generator = VideoGenerator(320, 180, 30, encoder='ffmpeg', preset='ultrafast', workers=workers, seed=1)
+    generator.generate_video(features, output_path, lambda progress, status: None)
+
+
+def test_parallel_render_finishes_and_matches_serial(tmp_path):
+    audio_path = make_fixture('beats', str(tmp_path), duration=2.0)
+    serial_path = str(tmp_path / 'serial.mp4')
+    parallel_path = str(tmp_path / 'parallel.mp4')
+    _render(audio_path, serial_path, workers=1)
+
+    # Si el pool hereda el stdin de ffmpeg, el codificador nunca termina
+    errors = []
+
+    def run():
+        try:
+            _render(audio_path, parallel_path, workers=2)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=120)
+    assert not thread.is_alive(), "el renderizado con workers=2 no terminó"
+    assert not errors, errors
+
+    with open(serial_path, 'rb') as serial, open(parallel_path, 'rb') as parallel:
+        assert serial.read() == parallel.read()
+
+
+
+def test_parallel_stats_belong_to_their_frame(tmp_path):
+    features = AudioProcessor(make_fixture('beats', str(tmp_path), duration=2.0)).process_audio()
+    counts = {}
+    for workers in (1, 2):
+        instrumentation = Instrumentation()
+        generator = VideoGenerator(160, 90, 30, encoder='ffmpeg', preset='ultrafast', workers=workers, seed=1)
+        generator.generate_video(features, str(tmp_path / f'{workers}.mp4'), lambda progress, status: None,
+                                 instrumentation=instrumentation)
+        counts[workers] = instrumentation.counts
+        # Cada frame lleva el tiempo de su propia simulación
+        timeline = instrumentation.timeline()
+        assert (timeline['update'] > 0).all()
+    assert counts[2] == counts[1]
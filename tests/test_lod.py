@@ -0,0 +1,27 @@
+import numpy as np
+from types import SimpleNamespace
+from src.video.lod import LODSettings, select_particles
+
+
+def _store(n):
+    rng = np.random.default_rng(0)
+    return SimpleNamespace(
+        life=np.ones(n),
+        size=rng.uniform(2, 10, n),
+        color=np.full((n, 3), 200.0),
+        importance=rng.uniform(0, 1, n),
+    )
+
+
+def test_budget_keeps_the_most_visible():
+    store = _store(100)
+    keep = select_particles(store, LODSettings(max_particles=10))
+    assert np.count_nonzero(keep) == 10
+    score = store.size * (0.5 + store.importance)
+    assert score[keep].min() >= score[~keep].max()
+
+
+def test_zero_budget_drops_everything():
+    keep = select_particles(_store(100), LODSettings(max_particles=0))
+    assert keep.shape == (100,)
+    assert not keep.any()
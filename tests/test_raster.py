@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from benchmarks.fixtures import make_fixture
+from src.audio.processor import AudioProcessor
+from src.video.control import ControlTrack
+from src.video.generator import VideoGenerator
+from src.video.lod import LODSettings
+from src.video.raster import available_rasterizers
+
+WIDTH, HEIGHT, FPS = 320, 180, 30
+
+# Diferencia máxima por canal frente a OpenCV: el backend NumPy compone el
+# alfa en forma cerrada y puede redondear distinto; Numba replica OpenCV
+TOLERANCE = {'numpy': 1, 'numba': 0}
+
+
+@pytest.mark.parametrize('lod', [None, LODSettings(detail_importance=0.5)], ids=['full', 'simple-shapes'])
+@pytest.mark.parametrize('name', ['numpy', 'numba'])
+def test_backend_matches_opencv(name, lod, tmp_path):
+    if name not in available_rasterizers():
+        pytest.skip(f"backend '{name}' no disponible")
+    features = AudioProcessor(make_fixture('dense', str(tmp_path), duration=1.5)).process_audio()
+    track = ControlTrack.from_features(features, FPS)
+    reference = VideoGenerator(WIDTH, HEIGHT, FPS, seed=5, rasterizer='opencv')
+    candidate = VideoGenerator(WIDTH, HEIGHT, FPS, seed=5, rasterizer=name)
+    reference.particle_system.lod = candidate.particle_system.lod = lod
+
+    drawn = 0
+    for frame_num, _ in zip(reference._simulate(track), candidate._simulate(track)):
+        expected = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+        actual = np.zeros_like(expected)
+        reference.particle_system.draw(expected)
+        candidate.particle_system.draw(actual)
+        difference = np.abs(expected.astype(np.int16) - actual.astype(np.int16)).max()
+        assert difference <= TOLERANCE[name], f"frame {frame_num}: diferencia {difference}"
+        drawn += expected.any()
+    assert drawn > 0
@@ -0,0 +1,80 @@
+import glob
+import os
+from dataclasses import replace
+import pytest
+import cli
+from benchmarks.fixtures import make_fixture
+from src.render.cache import RenderCache
+from src.render.job import RenderOptions, render_params
+from src.video.encoder import find_ffmpeg
+
+AUDIO_HASH = 'ab' * 20
+
+
+def _key(options, seed=1, width=None, height=None, audio_hash=AUDIO_HASH):
+    width = options.width if width is None else width
+    height = options.height if height is None else height
+    return RenderCache.key(audio_hash, render_params(options, seed, width, height))
+
+
+def test_hit_returns_stored_output(tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    video = tmp_path / 'video.mp4'
+    video.write_bytes(b'contenido del video')
+    key = _key(RenderOptions())
+    cache.put(key, str(video))
+
+    output = tmp_path / 'out.mp4'
+    assert cache.fetch(key, str(output))
+    assert output.read_bytes() == b'contenido del video'
+
+
+def test_miss_leaves_no_output(tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    output = tmp_path / 'out.mp4'
+    assert not cache.fetch(_key(RenderOptions()), str(output))
+    assert not output.exists()
+
+
+@pytest.mark.parametrize('changes', [
+    {'width': 1280}, {'height': 720}, {'fps': 60}, {'rasterizer': 'numpy'}, {'streaming': True},
+    {'max_particles': 100}, {'max_trail_points': 1000}, {'encoder': 'opencv'}, {'preset': 'fast'},
+    {'crf': 18}, {'threads': 2}, {'start_time': 1.0}, {'end_time': 5.0},
+    {'checkpoint_dir': 'checkpoints'}, {'checkpoint_dir': 'checkpoints', 'checkpoint_interval': 30.0},
+])
+def test_changed_option_misses(changes):
+    base = RenderOptions(checkpoint_dir='checkpoints') if 'checkpoint_interval' in changes else RenderOptions()
+    assert _key(replace(base, **changes)) != _key(base)
+
+
+def test_changed_seed_output_or_audio_misses():
+    options = RenderOptions()
+    key = _key(options)
+    assert _key(options, seed=2) != key
+    assert _key(options, width=1080, height=1920) != key
+    assert _key(options, audio_hash='cd' * 20) != key
+
+
+def test_unrelated_options_share_key():
+    # Lo que no cambia el vídeo (procesos, pipeline) no debe invalidar la caché
+    options = RenderOptions()
+    assert _key(replace(options, render_workers=4, pipeline_depth=2)) == _key(options)
+
+
+@pytest.mark.skipif(not find_ffmpeg(), reason="necesita ffmpeg")
+def test_cli_rerun_uses_cache(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv('MUSIFAZER_CACHE_DIR', str(tmp_path / 'cache'))
+    audio_path = make_fixture('beats', str(tmp_path), duration=1.0)
+    args = [audio_path, '-o', str(tmp_path), '--width', '160', '--height', '90', '--preset', 'ultrafast']
+
+    assert cli.main(args) == 0
+    assert 'caché' not in capsys.readouterr().out
+    assert cli.main(args) == 0
+    assert 'caché' in capsys.readouterr().out
+    first, second = sorted(glob.glob(os.path.join(str(tmp_path), 'output', '*.mp4')))
+    with open(first, 'rb') as a, open(second, 'rb') as b:
+        assert a.read() == b.read()
+
+    # Otro parámetro de la clave: se vuelve a renderizar
+    assert cli.main(args + ['--crf', '30']) == 0
+    assert 'caché' not in capsys.readouterr().out